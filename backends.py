@@ -0,0 +1,46 @@
+import importlib
+import os
+from typing import Dict, List
+
+# Name -> Modul mit der Backend-Schnittstelle; importiert wird erst in get_backend
+BACKENDS: Dict[str, str] = {}
+_loaded = {}
+
+
+def register(name: str, module: str):
+    """Registriert ein Backend, ohne dessen Modul (und Treiber) zu importieren.
+
+    Das Modul stellt DB_SYSTEM und read_benchmarks(resources, cell, data) bereit,
+    optional prepare, clear, load, explain_plans, update_benchmarks und close.
+    """
+    BACKENDS[name] = module
+
+
+def _check(name: str):
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Backend '{name}' nicht registriert (verfügbar: {', '.join(BACKENDS)})"
+        )
+
+
+def get_backend(name: str):
+    """Importiert das Backend beim ersten Zugriff und liefert das Modul."""
+    _check(name)
+    module = _loaded.get(name)
+    if module is None:
+        module = _loaded[name] = importlib.import_module(BACKENDS[name])
+    return module
+
+
+def selected_backends(spec: str = None) -> List[str]:
+    """Backends aus einer Komma-Liste (Standard: BENCH_BACKENDS, sonst alle registrierten)."""
+    spec = spec if spec is not None else os.getenv("BENCH_BACKENDS", "")
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    for name in names:
+        _check(name)
+    return names or list(BACKENDS)
+
+
+register("sqlalchemy", "sqlalchemy_benchmark")
+register("mongodb", "mongo_benchmark")
+register("duckdb", "duckdb_benchmark")
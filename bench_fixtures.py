@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+# In-Memory-Ersatz für AsyncSession und Mongo-Datenbank, gemeinsam genutzt von unittests und den Benchmarks
+
+
+class DummyRow(tuple):
+    """Positionale Zeile mit _mapping wie sqlalchemy.engine.Row."""
+
+    def __new__(cls, mapping):
+        row = super().__new__(cls, mapping.values())
+        row._mapping = mapping
+        return row
+
+
+class DummySession:
+    def __init__(self, rows):
+        # Zeilen einmal bauen, damit die Benchmarks die Kernel und nicht den Ersatz messen
+        self._rows = [DummyRow(row) for row in rows]
+
+    async def execute(self, stmt, params=None):
+        class Result:
+            def fetchall(self_inner):
+                return list(self._rows)
+
+        return Result()
+
+
+class DummyCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[: n or None]
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class DummyMongoDB:
+    def __init__(self, docs):
+        self.docs = docs
+        self.tracking = self
+
+    def find(self, match_stage, projection=None, **kwargs):
+        return DummyCursor(self.docs)
+
+    def aggregate(self, pipeline):
+        grouped = defaultdict(
+            lambda: {"_id": None, "metres_total": 0, "time_total": 0, "rounds": 0}
+        )
+        for doc in self.docs:
+            username = doc["username"]
+            if grouped[username]["_id"] is None:
+                grouped[username]["_id"] = username
+            grouped[username]["metres_total"] += doc["metres"]
+            grouped[username]["time_total"] += doc["time_seconds"]
+            grouped[username]["rounds"] += 1
+        result = list(grouped.values())
+
+        class AsyncIter:
+            def __init__(self, items):
+                self.items = items
+
+            async def __aiter__(self):
+                for item in self.items:
+                    yield item
+
+        return AsyncIter(result)
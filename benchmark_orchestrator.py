@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+from dotenv import load_dotenv
+
+from backends import selected_backends
+from result_store import ResultStore, new_run_id
+from sweep_config import SWEEP_NAME, load_sweep
+import main
+
+load_dotenv(override=True)
+
+MYSQL_SERVER_URI = os.getenv("MYSQL_SERVER_URI", "mysql+aiomysql://root@localhost:3306")
+SCHEMA_PREFIX = os.getenv("BENCH_SCHEMA_PREFIX", "bench_worker")
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "4"))
+
+_worker_id = 0
+
+
+def expand_jobs(
+    user_counts=main.USER_COUNTS,
+    tracking_counts=main.TRACKING_COUNTS,
+    benchmarks=main.BENCHMARKS,
+    n_runs=main.N_RUNS,
+    profile=main.PROFILE,
+    backends=main.BACKENDS,
+):
+    """Expandiert USER_COUNTS × TRACKING_COUNTS × BENCHMARKS × N_RUNS in einzelne Jobs."""
+    return [
+        {
+            "n_users": n_users,
+            "n_trackings": n_trackings,
+            "group_rounds": group_rounds,
+            "order_by": order_by,
+            "run": run,
+            "profile": profile,
+            "backends": backends,
+        }
+        for n_users in user_counts
+        for n_trackings in tracking_counts
+        for group_rounds, order_by in benchmarks
+        for run in range(1, n_runs + 1)
+    ]
+
+
+def _init_worker(worker_ids):
+    global _worker_id
+    _worker_id = worker_ids.get()
+
+
+async def _open_sql(schema):
+    # Treiber nur importieren, wenn der Job das SQL-Backend misst
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    from models import Base
+
+    admin_engine = create_async_engine(MYSQL_SERVER_URI)
+    async with admin_engine.begin() as conn:
+        await conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {schema}"))
+    await admin_engine.dispose()
+
+    engine = create_async_engine(f"{MYSQL_SERVER_URI}/{schema}")
+
+    async def setup_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    await setup_tables()
+    return engine, async_sessionmaker(engine, expire_on_commit=False), setup_tables
+
+
+async def _open_mongo(schema):
+    from mongo_client import DB_NAME, create_client, warm_up
+
+    mongo_client = create_client()
+    await warm_up(mongo_client)
+    return mongo_client, mongo_client[f"{DB_NAME}_{schema}"]
+
+
+async def _run_job(job, worker_id):
+    schema = f"{SCHEMA_PREFIX}_{worker_id}"
+    backends = job.get("backends", main.BACKENDS)
+    engine = session_factory = setup_tables = None
+    mongo_client = db = None
+    if "sqlalchemy" in backends:
+        engine, session_factory, setup_tables = await _open_sql(schema)
+    if "mongodb" in backends:
+        mongo_client, db = await _open_mongo(schema)
+    try:
+        return await main.run_benchmark_cell(
+            job["n_users"],
+            job["n_trackings"],
+            job["group_rounds"],
+            job["order_by"],
+            job["run"],
+            session_factory=session_factory,
+            db=db,
+            setup_tables=setup_tables,
+            profile=job.get("profile", main.PROFILE),
+            backends=backends,
+        )
+    finally:
+        if mongo_client is not None:
+            await mongo_client.close()
+        if engine is not None:
+            await engine.dispose()
+
+
+def run_job(job, worker_id=None):
+    return asyncio.run(_run_job(job, _worker_id if worker_id is None else worker_id))
+
+
+def run_orchestrated(jobs, concurrency=CONCURRENCY, exclusive=()):
+    """Verteilt die Jobs auf einen Worker-Pool mit eigenem MySQL-Schema und eigener Mongo-Datenbank je Worker.
+
+    Jobs, deren (group_rounds, order_by) in exclusive liegt, laufen danach
+    einzeln, ohne dass parallel weitere Jobs die Messung stören.
+    """
+    shared = [j for j in jobs if (j["group_rounds"], j["order_by"]) not in exclusive]
+    isolated = [j for j in jobs if (j["group_rounds"], j["order_by"]) in exclusive]
+    rows = {table: [] for table in main.RESULT_HEADERS}
+    cells = []
+    if shared:
+        with Manager() as manager:
+            worker_ids = manager.Queue()
+            for worker_id in range(concurrency):
+                worker_ids.put(worker_id)
+            with ProcessPoolExecutor(
+                max_workers=concurrency,
+                initializer=_init_worker,
+                initargs=(worker_ids,),
+            ) as executor:
+                cells.extend(executor.map(run_job, shared))
+    cells.extend(run_job(job, worker_id=0) for job in isolated)
+    for cell in cells:
+        for table, cell_rows in cell.items():
+            rows[table].extend(cell_rows)
+    return rows
+
+
+def store_results(rows):
+    """Schreibt die Ergebniszeilen je Tabelle unter einer gemeinsamen run_id."""
+    run_id = new_run_id()
+    for table, header in main.RESULT_HEADERS.items():
+        with ResultStore(table, header, run_id=run_id) as store:
+            store.extend(rows.get(table, []))
+    return run_id
+
+
+def jobs_for_sweep(sweep, n_runs=None, backends=None):
+    return expand_jobs(
+        sweep["user_counts"],
+        sweep["tracking_counts"],
+        sweep["benchmarks"],
+        n_runs or sweep["n_runs"],
+        sweep["profile"] or main.DATA_PROFILE,
+        backends or main.BACKENDS,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parallele Benchmark-Matrix")
+    parser.add_argument("--sweep", default=SWEEP_NAME, help="Sweep aus sweeps.toml")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--runs", type=int, help="Überschreibt n_runs des Sweeps")
+    parser.add_argument(
+        "--exclusive",
+        action="append",
+        default=[],
+        metavar="GROUP_ROUNDS:ORDER_BY",
+        help="Zelle exklusiv ausführen, z.B. all:start",
+    )
+    parser.add_argument(
+        "--backends",
+        help="Komma-Liste der Backends, z.B. mongodb (Standard: BENCH_BACKENDS, sonst alle)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    jobs = jobs_for_sweep(
+        load_sweep(args.sweep), args.runs, selected_backends(args.backends)
+    )
+    exclusive = {tuple(cell.split(":", 1)) for cell in args.exclusive}
+    rows = run_orchestrated(jobs, args.concurrency, exclusive)
+    run_id = store_results(rows)
+    print(
+        f"{len(jobs)} Jobs abgeschlossen, {len(rows[main.RESULT_TABLE_READ])} Messungen gespeichert (run_id {run_id})."
+    )
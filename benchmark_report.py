@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from statistics import NormalDist, median
+
+import numpy as np
+
+from result_store import RESULTS_DIR, list_runs, load_results
+
+CELL_KEYS = {
+    "read": (
+        "db_system",
+        "variant",
+        "n_users",
+        "n_trackings",
+        "group_rounds",
+        "order_by",
+    ),
+    "update": ("db_system", "variant", "n_users", "n_trackings"),
+    "kernel": ("implementation", "group_rounds", "order_by", "n_rows"),
+}
+THRESHOLD = 0.10
+ALPHA = 0.05
+BASELINE_FILE = "baseline.json"
+
+
+def mann_whitney_u(a, b):
+    """Zweiseitiger Mann-Whitney-U-Test (Normalapproximation mit Bindungskorrektur), liefert den p-Wert."""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    values = np.concatenate([a, b])
+    order = values.argsort(kind="mergesort")
+    ranks = np.empty(len(values), dtype=np.float64)
+    sorted_values = values[order]
+    _, first, counts = np.unique(sorted_values, return_index=True, return_counts=True)
+    average_ranks = first + (counts + 1) / 2.0
+    ranks[order] = np.repeat(average_ranks, counts)
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2.0
+    n = n1 + n2
+    tie_term = (counts**3 - counts).sum() / (n * (n - 1)) if n > 1 else 0.0
+    sigma = np.sqrt(n1 * n2 / 12.0 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2.0) / sigma
+    return 2 * (1 - NormalDist().cdf(abs(z)))
+
+
+def aggregate_cells(rows, keys, metric="duration"):
+    cells = defaultdict(list)
+    for row in rows:
+        if row.get(metric) is not None:
+            cells[tuple(row[k] for k in keys)].append(float(row[metric]))
+    return cells
+
+
+def compare_runs(
+    run_rows,
+    baseline_rows,
+    keys,
+    threshold=THRESHOLD,
+    alpha=ALPHA,
+    metric="duration",
+):
+    """Vergleicht die Mediane je Zelle mit der Baseline und markiert signifikante Verschlechterungen."""
+    current = aggregate_cells(run_rows, keys, metric)
+    baseline = aggregate_cells(baseline_rows, keys, metric)
+    report = []
+    for cell, values in sorted(current.items(), key=lambda item: str(item[0])):
+        base_values = baseline.get(cell)
+        entry = {
+            "cell": dict(zip(keys, cell)),
+            "n": len(values),
+            "median": median(values),
+            "p95": float(np.percentile(values, 95)),
+            "baseline_median": None,
+            "change": None,
+            "p_value": None,
+            "regression": False,
+        }
+        if base_values:
+            entry["baseline_median"] = median(base_values)
+            entry["change"] = entry["median"] / entry["baseline_median"] - 1
+            entry["p_value"] = mann_whitney_u(values, base_values)
+            entry["regression"] = (
+                entry["change"] > threshold and entry["p_value"] < alpha
+            )
+        report.append(entry)
+    return report
+
+
+def baseline_path(root):
+    return os.path.join(root, BASELINE_FILE)
+
+
+def load_baseline(root):
+    try:
+        with open(baseline_path(root)) as f:
+            return json.load(f)["run_id"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_baseline(root, run_id):
+    with open(baseline_path(root), "w") as f:
+        json.dump({"run_id": run_id}, f)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Regressionsbericht für Benchmarks")
+    parser.add_argument("--root", default=RESULTS_DIR)
+    parser.add_argument("--table", choices=sorted(CELL_KEYS), default="read")
+    parser.add_argument("--run", help="run_id (Standard: letzter Lauf)")
+    parser.add_argument("--baseline", help="run_id (Standard: gespeicherte Baseline)")
+    parser.add_argument(
+        "--metric",
+        default="duration",
+        help="Verglichene Spalte, z.B. duration oder mem_peak_bytes",
+    )
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Den Lauf als neue Baseline speichern",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    runs = list_runs(args.table, args.root)
+    run_id = args.run or (runs[-1] if runs else None)
+    if run_id is None:
+        print("Keine Benchmark-Läufe gefunden.")
+        return 2
+    if args.save_baseline:
+        save_baseline(args.root, run_id)
+        print(f"Baseline gesetzt: {run_id}")
+        return 0
+    baseline_id = args.baseline or load_baseline(args.root)
+    keys = CELL_KEYS[args.table]
+    run_rows = load_results(args.table, args.root, [run_id])
+    baseline_rows = (
+        load_results(args.table, args.root, [baseline_id]) if baseline_id else []
+    )
+    report = compare_runs(
+        run_rows, baseline_rows, keys, args.threshold, args.alpha, args.metric
+    )
+    print(f"Lauf {run_id} gegen Baseline {baseline_id}")
+    for entry in report:
+        cell = " ".join(f"{k}={v}" for k, v in entry["cell"].items())
+        line = f"{cell}: {args.metric} median={entry['median']:.6g} p95={entry['p95']:.6g} n={entry['n']}"
+        if entry["change"] is not None:
+            line += f" Δ={entry['change']:+.1%} p={entry['p_value']:.4f}"
+        if entry["regression"]:
+            line += " REGRESSION"
+        print(line)
+    regressions = sum(entry["regression"] for entry in report)
+    print(f"{regressions} Regression(en) über {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,39 @@
+import math
+import os
 import random
 import string
 import uuid
+from itertools import accumulate
 from datetime import datetime, timedelta, date, time as dt_time
 
+from row_kernels import km_to_metres
+
+GENDERS = ["male", "female", "other", "unknown"]
+DAYS_BACK = 730
+# Tag im Jahr mit der höchsten Aktivität (Sommeranfang)
+SEASON_PEAK_DAY = 172
+EVENT_PEAK_DAYS = 3
+
+# "uniform" entspricht dem bisherigen Generator; "production" bildet gemessene Daten nach:
+# wenige Vielläufer (Zipf), Trainings aus aufeinanderfolgenden Runden, Sommer- und Event-Spitzen
+PROFILES = {
+    "uniform": {
+        "zipf_exponent": 0.0,
+        "session_laps": 1,
+        "seasonal_amplitude": 0.0,
+        "event_peak_share": 0.0,
+        "gender_weights": [1, 1, 1, 1],
+    },
+    "production": {
+        "zipf_exponent": 1.1,
+        "session_laps": 8,
+        "seasonal_amplitude": 0.6,
+        "event_peak_share": 0.3,
+        "gender_weights": [48, 48, 2, 2],
+    },
+}
+DATA_PROFILE = os.getenv("BENCH_DATA_PROFILE", "uniform")
+
 
 def random_str(length=8):
     return "".join(random.choices(string.ascii_lowercase, k=length))
@@ -26,9 +57,58 @@ def time_to_seconds(val):
     return float(val)
 
 
+def resolve_profile(profile=DATA_PROFILE):
+    """Liefert die Parameter eines Profils; ein Dict mit "name" überschreibt einzelne Werte."""
+    overrides = {}
+    if isinstance(profile, dict):
+        overrides = {k: v for k, v in profile.items() if k != "name"}
+        profile = profile.get("name", "uniform")
+    if profile not in PROFILES:
+        raise ValueError(f"Datenprofil '{profile}' nicht definiert")
+    unknown = set(overrides) - set(PROFILES[profile])
+    if unknown:
+        raise ValueError(f"Unbekannte Profilparameter: {sorted(unknown)}")
+    return {**PROFILES[profile], **overrides}
+
+
+def _cum_weights(weights):
+    return list(accumulate(weights))
+
+
+def zipf_weights(n, exponent):
+    """Aktivitätsgewichte für Rang 1..n; exponent 0 ergibt Gleichverteilung."""
+    return [1 / rank**exponent for rank in range(1, n + 1)]
+
+
+def seasonal_weights(now, amplitude, days_back=DAYS_BACK):
+    """Gewichte je Tagesversatz 0..days_back mit Jahresspitze um SEASON_PEAK_DAY."""
+    return [
+        1
+        + amplitude
+        * math.cos(
+            2
+            * math.pi
+            * ((now - timedelta(days=offset)).timetuple().tm_yday - SEASON_PEAK_DAY)
+            / 365.25
+        )
+        for offset in range(days_back + 1)
+    ]
+
+
+def _session_start(now, offset):
+    start = now - timedelta(days=offset, seconds=random.randint(0, 86399))
+    return start.replace(microsecond=0)
+
+
 def generate_synchronized_testdata(
-    n_users=100, n_tracks=10, n_events=5, n_trackings=1000
+    n_users=100, n_tracks=10, n_events=5, n_trackings=1000, profile=DATA_PROFILE
 ):
+    """Erzeugt Users, Tracks, Events und Trackings; Verteilung der Trackings laut profile.
+
+    Runden einer Trainingseinheit folgen direkt aufeinander (Start = vorheriger
+    Start + Zeit) und bilden so "behind"-Ketten.
+    """
+    params = resolve_profile(profile)
     users = []
     for _ in range(n_users):
         user_id = str(uuid.uuid4())
@@ -38,7 +118,7 @@ def generate_synchronized_testdata(
                 "username": f"user_{random_str(12)}",
                 "first_name": random_str(5).capitalize(),
                 "last_name": random_str(7).capitalize(),
-                "gender": random.choice(["male", "female", "other", "unknown"]),
+                "gender": random.choices(GENDERS, weights=params["gender_weights"])[0],
                 "email": f"{random_str(12)}@test.com",
                 "birthday": str(random_date(1970, 2010)),
                 "hashed_password": random_str(32),
@@ -48,11 +128,13 @@ def generate_synchronized_testdata(
     tracks = []
     for _ in range(n_tracks):
         track_id = str(uuid.uuid4())
+        km = round(random.uniform(0.4, 10.0), 2)
         tracks.append(
             {
                 "track_id": track_id,
                 "name": f"Track_{random_str(4)}",
-                "km": round(random.uniform(0.4, 10.0), 2),
+                "km": km,
+                "metres": km_to_metres(km),
                 "activ": True,
             }
         )
@@ -69,27 +151,44 @@ def generate_synchronized_testdata(
             }
         )
 
+    now = datetime.utcnow()
+    user_weights = _cum_weights(zipf_weights(n_users, params["zipf_exponent"]))
+    day_weights = _cum_weights(seasonal_weights(now, params["seasonal_amplitude"]))
+    offsets = range(DAYS_BACK + 1)
     trackings = []
-    for _ in range(n_trackings):
-        user = random.choice(users)
+    while len(trackings) < n_trackings:
+        user = random.choices(users, cum_weights=user_weights)[0]
         track = random.choice(tracks)
         event = random.choice(events)
-        tracking_time = random_time()
-        trackings.append(
-            {
-                "tracking_id": str(uuid.uuid4()),
-                "user_id": user["user_id"],
-                "track_id": track["track_id"],
-                "event_id": event["event_id"],
-                "username": user["username"],
-                "gender": user["gender"],
-                "km": track["km"],
-                "event_name": event["name"],
-                "start_date_time": datetime.utcnow()
-                - timedelta(days=random.randint(0, 730)),
-                "time": tracking_time.strftime("%H:%M:%S"),
-                "time_seconds": time_to_seconds(tracking_time),
-            }
+        if random.random() < params["event_peak_share"]:
+            # Trainings rund um den Eventstart
+            offset = (now - event["start"]).days + random.randint(
+                -EVENT_PEAK_DAYS, EVENT_PEAK_DAYS
+            )
+            offset = min(max(offset, 0), DAYS_BACK)
+        else:
+            offset = random.choices(offsets, cum_weights=day_weights)[0]
+        start = _session_start(now, offset)
+        laps = min(
+            random.randint(1, params["session_laps"]), n_trackings - len(trackings)
         )
+        for _ in range(laps):
+            tracking_time = random_time()
+            trackings.append(
+                {
+                    "tracking_id": str(uuid.uuid4()),
+                    "user_id": user["user_id"],
+                    "track_id": track["track_id"],
+                    "event_id": event["event_id"],
+                    "username": user["username"],
+                    "gender": user["gender"],
+                    "metres": track["metres"],
+                    "event_name": event["name"],
+                    "start_date_time": start,
+                    "time": tracking_time.strftime("%H:%M:%S"),
+                    "time_seconds": time_to_seconds(tracking_time),
+                }
+            )
+            start += timedelta(seconds=time_to_seconds(tracking_time))
 
     return users, tracks, events, trackings
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+from datetime import date, datetime
+from typing import List, Dict, Any
+
+SQL_BATCH_SIZE = int(os.getenv("LOAD_SQL_BATCH_SIZE", "2000"))
+MONGO_BATCH_SIZE = int(os.getenv("LOAD_MONGO_BATCH_SIZE", "10000"))
+TRACKING_PARTITIONS = int(os.getenv("LOAD_TRACKING_PARTITIONS", "4"))
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _partitions(items, n):
+    return [items[p::n] for p in range(max(n, 1))]
+
+
+def user_params(users: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "user_id": user["user_id"],
+            "username": user["username"],
+            "first_name": user["first_name"],
+            "last_name": user["last_name"],
+            "gender": user["gender"],
+            "email": user["email"],
+            "birthday": date.fromisoformat(user["birthday"]),
+            "hashed_password": user["hashed_password"],
+        }
+        for user in users
+    ]
+
+
+def track_params(tracks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "track_id": track["track_id"],
+            "name": track["name"],
+            "distanz": track["km"],
+            "activ": track["activ"],
+        }
+        for track in tracks
+    ]
+
+
+def event_params(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "event_id": event["event_id"],
+            "name": event["name"],
+            "start": event["start"],
+            "end": event["end"],
+        }
+        for event in events
+    ]
+
+
+def tracking_params(trackings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "tracking_id": tr["tracking_id"],
+            "start_date_time": tr["start_date_time"],
+            "time": datetime.strptime(tr["time"], "%H:%M:%S").time(),
+            "user_id": tr["user_id"],
+            "track_id": tr["track_id"],
+            "event_id": tr["event_id"],
+        }
+        for tr in trackings
+    ]
+
+
+async def _insert_batches(session_factory, table, rows, batch_size):
+    from sqlalchemy import insert
+
+    async with session_factory() as session:
+        for batch in _batches(rows, batch_size):
+            await session.execute(insert(table), batch)
+        await session.commit()
+
+
+async def load_sql(
+    session_factory,
+    users,
+    tracks,
+    events,
+    trackings,
+    partitions: int = TRACKING_PARTITIONS,
+    batch_size: int = SQL_BATCH_SIZE,
+) -> float:
+    """Lädt einen Datensatz per Batch-Insert, je Tabelle auf eigener Verbindung, und liefert die Dauer.
+
+    users, track und event sind voneinander unabhängig und laufen parallel;
+    tracking folgt danach (FKs) und wird auf partitions Verbindungen verteilt.
+    """
+    # SQLAlchemy erst hier importieren, damit reine MongoDB-Läufe es nicht laden
+    from models import User, Track, Event, Tracking
+
+    t1 = time.perf_counter()
+    await asyncio.gather(
+        _insert_batches(
+            session_factory, User.__table__, user_params(users), batch_size
+        ),
+        _insert_batches(
+            session_factory, Track.__table__, track_params(tracks), batch_size
+        ),
+        _insert_batches(
+            session_factory, Event.__table__, event_params(events), batch_size
+        ),
+    )
+    await asyncio.gather(
+        *(
+            _insert_batches(session_factory, Tracking.__table__, part, batch_size)
+            for part in _partitions(tracking_params(trackings), partitions)
+        )
+    )
+    return time.perf_counter() - t1
+
+
+async def _insert_many(collection, docs, batch_size):
+    for batch in _batches(docs, batch_size):
+        # Kopien, da insert_many _id in die Dokumente schreibt und der Datensatz geteilt ist
+        await collection.insert_many([dict(doc) for doc in batch], ordered=False)
+
+
+async def load_mongo(
+    db,
+    users,
+    tracks,
+    events,
+    trackings,
+    partitions: int = TRACKING_PARTITIONS,
+    batch_size: int = MONGO_BATCH_SIZE,
+) -> float:
+    """Lädt einen Datensatz mit ungeordneten insert_many-Batches parallel in alle Collections."""
+    t1 = time.perf_counter()
+    await asyncio.gather(
+        _insert_many(db.users, users, batch_size),
+        _insert_many(db.tracks, tracks, batch_size),
+        _insert_many(db.events, events, batch_size),
+        *(
+            _insert_many(db.tracking, part, batch_size)
+            for part in _partitions(trackings, partitions)
+        ),
+    )
+    return time.perf_counter() - t1
@@ -0,0 +1,144 @@
+import math
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from duckdb_filter import connect, export_snapshot, get_tracking_results_duckdb
+from memory_profile import MEMORY_PROFILE, TOP_ALLOCATIONS, measure_memory
+from row_kernels import aggregate_rows
+
+START_PERIOD = date(2010, 1, 1)
+END_PERIOD = date(2025, 12, 31)
+# Sortierschlüssel je Abfrageform; bei Gleichstand dürfen DuckDB und Python unterschiedlich reihen
+SORT_KEYS = {
+    ("all", "start"): ("km_total",),
+    ("all", "best"): ("km_total",),
+    ("behind", "start"): ("start_date_time",),
+    ("behind", "best"): ("rounds", "time"),
+    ("none", "start"): ("start_date_time",),
+    ("none", "best"): ("time",),
+}
+IDENTITY_KEYS = {
+    "all": ("username",),
+    "behind": ("tracking_id",),
+    "none": ("tracking_id",),
+}
+
+
+def reference_results(trackings, gender, group_rounds, order_by, limit):
+    """Ergebnis der Python-Kernel (wie get_tracking_results_mongodb_python) auf denselben Snapshot-Zeilen."""
+    start = datetime.combine(START_PERIOD, datetime.min.time())
+    end = datetime.combine(END_PERIOD + timedelta(days=1), datetime.min.time())
+    rows = [
+        (
+            tr["tracking_id"],
+            tr["start_date_time"],
+            tr["time_seconds"],
+            tr["metres"],
+            tr["event_name"],
+            tr["username"],
+        )
+        for tr in trackings
+        if start <= tr["start_date_time"] < end
+        and (not gender or tr["gender"] == gender)
+    ]
+    # Gleiche Startzeiten: der stabile Sort der Kernel folgt dann tracking_id wie BEHIND_QUERY
+    rows.sort()
+    return aggregate_rows(rows, group_rounds, order_by, limit, float)
+
+
+def _same_value(a, b):
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+    return a == b
+
+
+def _same_rows(a, b):
+    return a.keys() == b.keys() and all(_same_value(a[k], b[k]) for k in a)
+
+
+def results_match(res, expected, group_rounds, order_by):
+    """Vergleicht Ergebnisse unabhängig von der Reihenfolge gleichrangiger Zeilen."""
+    if len(res) != len(expected):
+        return False
+    sort_keys = SORT_KEYS[(group_rounds, order_by)]
+    for a, b in zip(res, expected):
+        if not all(_same_value(a[k], b[k]) for k in sort_keys):
+            return False
+    identity = IDENTITY_KEYS[group_rounds]
+
+    def by_identity(rows):
+        return sorted(rows, key=lambda r: tuple(str(r[k]) for k in identity))
+
+    return all(
+        _same_rows(a, b) for a, b in zip(by_identity(res), by_identity(expected))
+    )
+
+
+async def benchmark_duckdb(
+    con,
+    gender,
+    group_rounds,
+    order_by,
+    limit,
+    variant="duckdb",
+    memory=MEMORY_PROFILE,
+    top_allocations=TOP_ALLOCATIONS,
+    trackings=None,
+):
+    def call():
+        return get_tracking_results_duckdb(
+            con,
+            gender,
+            START_PERIOD,
+            END_PERIOD,
+            order_by,
+            group_rounds,
+            limit,
+        )
+
+    t1 = time.perf_counter()
+    res = await call()
+    t2 = time.perf_counter()
+    duration = t2 - t1
+    result_count = len(res)
+    result = {
+        "variant": variant,
+        "duration": duration,
+        "result_count": result_count,
+        "equal": None,
+    }
+    if trackings is not None:
+        expected = reference_results(trackings, gender, group_rounds, order_by, limit)
+        result["equal"] = results_match(res, expected, group_rounds, order_by)
+    if memory:
+        # tracemalloc sieht nur Python-Allokationen; DuckDB selbst zeigt sich im RSS
+        result.update(await measure_memory(call, top_allocations))
+    return result
+
+
+# Backend-Schnittstelle für main.run_benchmark_cell, siehe backends.register
+
+DB_SYSTEM = "DuckDB"
+
+
+async def read_benchmarks(resources, cell, data):
+    """Liest aus einem Parquet-Snapshot der Trackings; Laden und Updates entfallen."""
+    print("\n--- Starte DuckDB-Benchmark (Parquet-Snapshot) ---")
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        snapshot_path = os.path.join(snapshot_dir, "tracking.parquet")
+        export_snapshot(data[3], snapshot_path)
+        con = connect(snapshot_path)
+        try:
+            res = await benchmark_duckdb(
+                con=con,
+                gender=cell["gender"],
+                group_rounds=cell["group_rounds"],
+                order_by=cell["order_by"],
+                limit=cell["limit"],
+                trackings=data[3],
+            )
+        finally:
+            con.close()
+    return [res]
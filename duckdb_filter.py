@@ -0,0 +1,200 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from result_output import render
+from row_kernels import METRES_PER_KM
+
+SNAPSHOT_COLUMNS = (
+    "tracking_id",
+    "user_id",
+    "event_id",
+    "start_date_time",
+    "time_seconds",
+    "metres",
+    "event_name",
+    "username",
+    "gender",
+)
+
+FILTERED = """
+    SELECT * FROM tracking
+    WHERE start_date_time >= $start AND start_date_time < $end
+      AND ($gender IS NULL OR gender = $gender)
+"""
+
+# Summiert ganze Meter und rechnet erst in der Ausgabe in km um
+ALL_QUERY = f"""
+    SELECT username,
+           SUM(metres) / {METRES_PER_KM}.0 AS km_total,
+           SUM(time_seconds) AS time_total,
+           COUNT(*) AS rounds
+    FROM ({FILTERED})
+    GROUP BY username
+    ORDER BY SUM(metres) DESC
+    LIMIT $limit
+"""
+
+NONE_QUERY = f"""
+    SELECT tracking_id, start_date_time, time_seconds AS time,
+           metres / {METRES_PER_KM}.0 AS km, event_name, username
+    FROM ({FILTERED})
+    ORDER BY {{order_clause}}
+    LIMIT $limit
+"""
+
+# Eine Runde setzt die Kette fort, wenn sie höchstens 1 s nach Kettenstart plus
+# bisheriger Kettenzeit beginnt (wie row_kernels._chain_rows). Mit
+# drift = Start - Laufzeit aller früheren Runden des Users heißt das
+# |drift - drift(Kettenstart)| <= 1. Springt drift zwischen Nachbarn um mehr als
+# 2 s, beginnt sicher eine neue Kette; nur innerhalb dieser Segmente läuft die
+# Rekursion, daher hängt die Tiefe von der Kettenlänge ab, nicht von der Anzahl
+# Trackings je User.
+BEHIND_QUERY = f"""
+    WITH RECURSIVE drifted AS (
+        SELECT *,
+               epoch(start_date_time) - COALESCE(
+                   SUM(time_seconds) OVER (
+                       PARTITION BY username ORDER BY start_date_time, tracking_id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ),
+                   0
+               ) AS drift
+        FROM ({FILTERED})
+    ),
+    segmented AS (
+        SELECT *,
+               SUM(
+                   CASE
+                       WHEN prev_drift IS NULL OR abs(drift - prev_drift) > 2
+                       THEN 1 ELSE 0
+                   END
+               ) OVER (
+                   PARTITION BY username ORDER BY start_date_time, tracking_id
+                   ROWS UNBOUNDED PRECEDING
+               ) AS seg
+        FROM (
+            SELECT *,
+                   LAG(drift) OVER (
+                       PARTITION BY username ORDER BY start_date_time, tracking_id
+                   ) AS prev_drift
+            FROM drifted
+        )
+    ),
+    numbered AS (
+        SELECT *,
+               ROW_NUMBER() OVER (
+                   PARTITION BY username, seg ORDER BY start_date_time, tracking_id
+               ) AS pos
+        FROM segmented
+    ),
+    chains(username, seg, pos, anchor, grp) AS (
+        SELECT username, seg, pos, drift, 0 FROM numbered WHERE pos = 1
+        UNION ALL
+        SELECT n.username, n.seg, n.pos,
+               CASE WHEN abs(n.drift - c.anchor) <= 1 THEN c.anchor ELSE n.drift END,
+               c.grp + CASE WHEN abs(n.drift - c.anchor) <= 1 THEN 0 ELSE 1 END
+        FROM chains c
+        JOIN numbered n
+          ON n.username = c.username AND n.seg = c.seg AND n.pos = c.pos + 1
+    ),
+    grouped AS (
+        SELECT n.*, c.grp
+        FROM numbered n JOIN chains c USING (username, seg, pos)
+    )
+    SELECT arg_min(tracking_id, start_date_time) AS tracking_id,
+           MIN(start_date_time) AS start_date_time,
+           SUM(time_seconds) AS time,
+           arg_min(metres, start_date_time) / {METRES_PER_KM}.0 AS km,
+           arg_min(event_name, start_date_time) AS event_name,
+           username,
+           COUNT(*) AS rounds
+    FROM grouped
+    GROUP BY username, seg, grp
+    ORDER BY {{order_clause}}
+    LIMIT $limit
+"""
+
+
+def export_snapshot(trackings: List[Dict[str, Any]], path: str):
+    """Schreibt die Trackings eines Datensatzes als Parquet-Snapshot für DuckDB."""
+    table = pa.table(
+        {column: [tr[column] for tr in trackings] for column in SNAPSHOT_COLUMNS}
+    )
+    pq.write_table(table, path)
+
+
+def connect(path: str):
+    con = duckdb.connect()
+    # CREATE VIEW erlaubt keine gebundenen Parameter; die Relation-API übergibt path ohne SQL-Text
+    con.read_parquet(path).create_view("tracking")
+    return con
+
+
+def _query_tracking_results(
+    con, gender, start_period, end_period, order_by, group_rounds, limit, output
+):
+    params = {
+        "start": datetime.combine(start_period, datetime.min.time()),
+        "end": datetime.combine(end_period + timedelta(days=1), datetime.min.time()),
+        "gender": gender or None,
+        "limit": limit,
+    }
+    if group_rounds == "all":
+        query = ALL_QUERY
+    elif group_rounds == "behind":
+        if order_by == "start":
+            order_clause = "start_date_time DESC, username"
+        else:
+            order_clause = "rounds DESC, time ASC, username, start_date_time"
+        query = BEHIND_QUERY.format(order_clause=order_clause)
+    else:
+        if order_by == "start":
+            order_clause = "start_date_time DESC, tracking_id DESC"
+        else:
+            order_clause = "time ASC, tracking_id ASC"
+        query = NONE_QUERY.format(order_clause=order_clause)
+    cursor = con.cursor()
+    try:
+        cursor.execute(query, params)
+        if output != "dicts":
+            # DuckDB liefert die Spalten bereits als Arrow-Puffer
+            table = cursor.to_arrow_table()
+            if output == "arrow":
+                return pa.RecordBatch.from_arrays(
+                    [column.combine_chunks() for column in table.columns],
+                    schema=table.schema,
+                )
+            return render(table.to_pydict(), output)
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+async def get_tracking_results_duckdb(
+    con,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    order_by: str = "start",
+    group_rounds: str = "none",
+    limit: int = 100,
+    output: str = "dicts",
+) -> List[Dict[str, Any]]:
+    """Wertet dieselbe Abfrage wie get_tracking_results_* eingebettet mit DuckDB auf einem Parquet-Snapshot aus."""
+    return await asyncio.to_thread(
+        _query_tracking_results,
+        con,
+        gender,
+        start_period,
+        end_period,
+        order_by,
+        group_rounds,
+        limit,
+        output,
+    )
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import time
+from datetime import date, datetime
+
+from sqlalchemy_filter import get_tracking_results_python, time_to_seconds
+from mongo_filter import get_tracking_results_mongodb_python
+from parallel_aggregation import get_tracking_results_python_parallel
+from mongo_benchmark import results_almost_equal
+from parallel_benchmark import generate_rows
+from result_store import ResultStore
+from bench_fixtures import DummySession, DummyMongoDB
+
+ROW_COUNTS = [1000, 10000, 100000, 1000000, 5000000]
+KERNELS = [
+    ("all", "best"),
+    ("behind", "start"),
+    ("behind", "best"),
+    ("none", "start"),
+    ("none", "best"),
+]
+N_RUNS = 3
+SEED = 42
+LIMIT = 100
+REFERENCE = "python"
+RESULT_TABLE_KERNEL = "kernel"
+KERNEL_HEADER = [
+    "timestamp",
+    "implementation",
+    "group_rounds",
+    "order_by",
+    "n_rows",
+    "seed",
+    "run",
+    "duration",
+    "speedup",
+    "equal",
+]
+
+# (Implementierung, Backend, Funktion); Backends derselben Art teilen sich die Zeilen.
+IMPLEMENTATIONS = [
+    ("python", "sql", get_tracking_results_python),
+    ("python_parallel", "sql", get_tracking_results_python_parallel),
+    ("mongodb_python", "mongo", get_tracking_results_mongodb_python),
+]
+PERIOD = (None, date(2010, 1, 1), date(2025, 12, 31))
+
+
+def to_mongo_docs(rows):
+    """Liefert zu den SQL-Zeilen neue projizierte Mongo-Dokumente (time in Sekunden); rows bleibt unverändert."""
+    return [{**row, "time": time_to_seconds(row["time"])} for row in rows]
+
+
+async def time_kernel(func, backend, group_rounds, order_by, limit=LIMIT):
+    t1 = time.perf_counter()
+    result = await func(backend, *PERIOD, order_by, group_rounds, limit)
+    return time.perf_counter() - t1, result
+
+
+async def run_kernels(
+    row_counts=ROW_COUNTS,
+    kernels=KERNELS,
+    implementations=IMPLEMENTATIONS,
+    n_runs=N_RUNS,
+    seed=SEED,
+):
+    """Misst die Gruppierungskernel ohne Datenbankserver und vergleicht sie mit der Referenzimplementierung."""
+    measurements = []
+    for n_rows in row_counts:
+        rows = generate_rows(n_rows, seed=seed)
+        backends = {"sql": DummySession(rows)}
+        reference = {}
+        for name, kind, func in implementations:
+            if kind == "mongo" and kind not in backends:
+                backends[kind] = DummyMongoDB(to_mongo_docs(rows))
+            for group_rounds, order_by in kernels:
+                for run in range(1, n_runs + 1):
+                    duration, result = await time_kernel(
+                        func, backends[kind], group_rounds, order_by
+                    )
+                    key = (group_rounds, order_by, run)
+                    if name == REFERENCE:
+                        reference[key] = (duration, result)
+                    ref_duration, ref_result = reference.get(key, (None, None))
+                    measurements.append(
+                        [
+                            datetime.now().isoformat(),
+                            name,
+                            group_rounds,
+                            order_by,
+                            n_rows,
+                            seed,
+                            run,
+                            duration,
+                            ref_duration / duration if ref_duration else None,
+                            (
+                                results_almost_equal(
+                                    ref_result,
+                                    result,
+                                    float_keys=("km_total", "time_total", "time"),
+                                )
+                                if ref_result is not None
+                                else None
+                            ),
+                        ]
+                    )
+                print(
+                    f"{name:>16} {group_rounds:>6}/{order_by:<5} {n_rows:>8} Zeilen: "
+                    f"{min(m[7] for m in measurements[-n_runs:]):.4f}s"
+                )
+        del rows, backends
+    return measurements
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-Benchmarks der Python-Kernel")
+    parser.add_argument("--max-rows", type=int, default=max(ROW_COUNTS))
+    parser.add_argument("--runs", type=int, default=N_RUNS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    row_counts = [n for n in ROW_COUNTS if n <= args.max_rows]
+    measurements = asyncio.run(
+        run_kernels(row_counts, n_runs=args.runs, seed=args.seed)
+    )
+    with ResultStore(RESULT_TABLE_KERNEL, KERNEL_HEADER) as store:
+        store.extend(measurements)
+    mismatches = [m for m in measurements if m[-1] is False]
+    print(
+        f"{len(measurements)} Messungen gespeichert (run_id {store.run_id}), "
+        f"{len(mismatches)} Abweichungen zur Referenz '{REFERENCE}'"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import asyncio
+from typing import List, Dict, Any, Optional
+
+from sortedcontainers import SortedList
+
+from row_kernels import km_to_metres, metres_to_km
+from sqlalchemy_filter import time_to_seconds
+
+SUBSCRIBER_QUEUE_SIZE = 10000
+
+
+class LiveLeaderboard:
+    """Live-Rangliste eines Events, die je neuem Tracking inkrementell gepflegt wird.
+
+    Sortierung wie bei group_rounds="all": km_total absteigend, bei Gleichstand
+    time_total aufsteigend, dann username. Strecken werden intern als ganze
+    Meter summiert. Ist event_id gesetzt, werden Trackings anderer Events
+    ignoriert.
+    """
+
+    def __init__(self, event_id=None):
+        self.event_id = event_id
+        self._totals = {}
+        self._ranking = SortedList()
+        self._subscribers = set()
+
+    def __len__(self):
+        return len(self._totals)
+
+    @staticmethod
+    def _key(username, totals):
+        return (-totals["metres_total"], totals["time_total"], username)
+
+    @staticmethod
+    def _result(username, totals):
+        return {
+            "username": username,
+            "km_total": metres_to_km(totals["metres_total"]),
+            "time_total": totals["time_total"],
+            "rounds": totals["rounds"],
+        }
+
+    def load(self, results: List[Dict[str, Any]]):
+        """Initialisiert die Rangliste aus Ergebnissen von get_tracking_results_* mit group_rounds="all"."""
+        self._totals = {
+            row["username"]: {
+                "metres_total": km_to_metres(row["km_total"]),
+                "time_total": time_to_seconds(row["time_total"]),
+                "rounds": row["rounds"],
+            }
+            for row in results
+        }
+        self._ranking = SortedList(
+            self._key(username, totals) for username, totals in self._totals.items()
+        )
+
+    def add_tracking(self, tracking: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Verbucht ein Tracking und liefert die Rangänderung des Läufers (None bei fremdem Event).
+
+        Abonnenten erhalten nur dieses eine Ereignis. "shifted" beschreibt die
+        dadurch verschobenen Benutzer als (erster, letzter neuer Rang, Versatz),
+        mit neuer Rang = alter Rang + Versatz, oder None; so bleibt ein Update
+        auch bei großen Sprüngen O(log n).
+        """
+        if self.event_id is not None and tracking.get("event_id") != self.event_id:
+            return None
+        username = tracking["username"]
+        totals = self._totals.get(username)
+        if totals is None:
+            old_rank = None
+            totals = {"metres_total": 0, "time_total": 0, "rounds": 0}
+            self._totals[username] = totals
+        else:
+            key = self._key(username, totals)
+            old_rank = self._ranking.index(key) + 1
+            self._ranking.remove(key)
+        totals["metres_total"] += tracking["metres"]
+        totals["time_total"] += time_to_seconds(tracking["time"])
+        totals["rounds"] += 1
+        key = self._key(username, totals)
+        self._ranking.add(key)
+        new_rank = self._ranking.index(key) + 1
+        change = {
+            "old_rank": old_rank,
+            "new_rank": new_rank,
+            "shifted": self._shifted(old_rank, new_rank),
+            **self._result(username, totals),
+        }
+        if old_rank != new_rank:
+            self._publish(change)
+        return change
+
+    def _shifted(self, old_rank, new_rank):
+        """Bereich der neuen Ränge, die der Läufer verschoben hat, als (erster, letzter, Versatz)."""
+        if old_rank is None:
+            # Neueinstieg: alle dahinter rutschen einen Platz nach hinten
+            last = len(self._ranking)
+            return (new_rank + 1, last, 1) if new_rank < last else None
+        if new_rank < old_rank:
+            return (new_rank + 1, old_rank, 1)
+        if new_rank > old_rank:
+            return (old_rank, new_rank - 1, -1)
+        return None
+
+    def rank(self, username) -> Optional[int]:
+        totals = self._totals.get(username)
+        if totals is None:
+            return None
+        return self._ranking.index(self._key(username, totals)) + 1
+
+    def top(self, n: int = 10) -> List[Dict[str, Any]]:
+        return [
+            self._result(username, self._totals[username])
+            for _, _, username in self._ranking.islice(0, n)
+        ]
+
+    def _publish(self, change):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(change)
+
+    def subscribe(self) -> "Subscription":
+        """Liefert Rangänderungen als asynchronen Iterator, registriert ab sofort."""
+        return Subscription(self)
+
+
+class Subscription:
+    """Warteschlange eines Abonnenten der Live-Rangliste.
+
+    Die Queue wird schon beim Erzeugen registriert, damit zwischen subscribe()
+    und der ersten Iteration keine Änderung verloren geht.
+    """
+
+    def __init__(self, board: LiveLeaderboard):
+        self._board = board
+        self._queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        board._subscribers.add(self._queue)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._queue is None:
+            raise StopAsyncIteration
+        try:
+            return await self._queue.get()
+        except asyncio.CancelledError:
+            # wie beim bisherigen Generator: Abbruch des Lesers beendet das Abo
+            self.close()
+            raise
+
+    def close(self):
+        if self._queue is not None:
+            self._board._subscribers.discard(self._queue)
+            self._queue = None
+
+    async def aclose(self):
+        self.close()
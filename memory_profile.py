@@ -0,0 +1,56 @@
+import gc
+import os
+import tracemalloc
+
+MEMORY_PROFILE = os.getenv("BENCH_MEMORY_PROFILE", "0") == "1"
+TOP_ALLOCATIONS = int(os.getenv("BENCH_TOP_ALLOCATIONS", "0"))
+TRACEBACK_FRAMES = 5
+MEMORY_COLUMNS = ["mem_peak_bytes", "mem_blocks_per_row", "rss_delta_bytes"]
+
+
+def current_rss():
+    """Aktuelle Resident Set Size des Prozesses in Bytes (psutil oder /proc, sonst None)."""
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+async def measure_memory(call, top_allocations=TOP_ALLOCATIONS):
+    """Führt call() unter tracemalloc aus und liefert Peak, gehaltene Blöcke je Ergebniszeile und RSS-Differenz."""
+    gc.collect()
+    rss_before = current_rss()
+    tracemalloc.start(TRACEBACK_FRAMES if top_allocations else 1)
+    try:
+        res = await call()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    rss_after = current_rss()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    stats = snapshot.statistics("lineno")
+    blocks = sum(stat.count for stat in stats)
+    return {
+        "mem_peak": peak,
+        "mem_blocks_per_row": blocks / len(res) if res else None,
+        "rss_delta": (
+            rss_after - rss_before
+            if rss_before is not None and rss_after is not None
+            else None
+        ),
+        "top_allocations": [
+            str(stat) for stat in snapshot.statistics("traceback")[:top_allocations]
+        ],
+    }
+
+
+def memory_columns(res):
+    return [res.get("mem_peak"), res.get("mem_blocks_per_row"), res.get("rss_delta")]
@@ -12,6 +12,7 @@ from sqlalchemy import (
     Time,
     DateTime,
     Enum,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.asyncio import AsyncAttrs
@@ -102,6 +103,7 @@ class Club(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_gender", "gender"),)
 
     user_id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     username = Column(String(100), nullable=True, unique=True, index=True)
@@ -210,6 +212,22 @@ class TrackTrackingPoint(Base):
 
 class Tracking(Base):
     __tablename__ = "tracking"
+    __table_args__ = (
+        Index("ix_tracking_event_start", "event_id", "start_date_time"),
+        # Reihenfolge exakt wie ORDER BY/Cursor der Seitenabfrage, damit tiefe Seiten ohne Filesort auskommen
+        Index("ix_tracking_start", "start_date_time", "tracking_id"),
+        # deckt Filter, Joins und time der Ranglistenabfragen ab (PK ist implizit enthalten)
+        Index(
+            "ix_tracking_start_cover",
+            "start_date_time",
+            "user_id",
+            "track_id",
+            "time",
+            "event_id",
+        ),
+        Index("ix_tracking_user_start", "user_id", "start_date_time"),
+        Index("ix_tracking_time", "time"),
+    )
 
     tracking_id = Column(GUID(), primary_key=True, unique=True, default=uuid.uuid4)
     start_date_time = Column(TIMESTAMP(timezone=True))
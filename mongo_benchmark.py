@@ -5,6 +5,11 @@ from mongo.mongo_filter import (
     get_tracking_results_mongodb,
     get_tracking_results_mongodb_python,
 )
+from dual_loader import load_mongo
+from memory_profile import MEMORY_PROFILE, TOP_ALLOCATIONS, measure_memory
+from mongo_client import close_client, get_database, warm_up
+from mongo_denorm_sync import DenormalizationSync
+from mongo_indexes import create_indexes, explain_query
 
 
 def to_seconds(val):
@@ -48,21 +53,22 @@ def results_almost_equal(list1, list2, float_keys=("km_total", "time_total"), to
 
 
 async def benchmark_mongo(
-    db, gender, group_rounds, order_by, limit, variant="mongo_agg"
+    db,
+    gender,
+    group_rounds,
+    order_by,
+    limit,
+    variant="mongo_agg",
+    memory=MEMORY_PROFILE,
+    top_allocations=TOP_ALLOCATIONS,
 ):
-    t1 = time.perf_counter()
     if variant == "mongo_agg":
-        res_db = await get_tracking_results_mongodb(
-            db,
-            gender,
-            date(2010, 1, 1),
-            date(2025, 12, 31),
-            order_by,
-            group_rounds,
-            limit,
-        )
+        query = get_tracking_results_mongodb
     else:
-        res_db = await get_tracking_results_mongodb_python(
+        query = get_tracking_results_mongodb_python
+
+    def call():
+        return query(
             db,
             gender,
             date(2010, 1, 1),
@@ -71,15 +77,22 @@ async def benchmark_mongo(
             group_rounds,
             limit,
         )
+
+    t1 = time.perf_counter()
+    res_db = await call()
     t2 = time.perf_counter()
     duration = t2 - t1
     result_count = len(res_db)
-    return {
+    result = {
         "variant": variant,
         "duration": duration,
         "result_count": result_count,
         "equal": None,
     }
+    if memory:
+        # eigener Durchlauf, damit tracemalloc die Zeitmessung nicht verfälscht
+        result.update(await measure_memory(call, top_allocations))
+    return result
 
 
 async def benchmark_update_username_mongo(db, user_id, new_username):
@@ -97,5 +110,121 @@ async def benchmark_update_username_mongo(db, user_id, new_username):
 async def benchmark_update_gender_mongo(db, user_id, new_gender):
     t1 = time.perf_counter()
     await db.users.update_one({"user_id": user_id}, {"$set": {"gender": new_gender}})
+    await db.tracking.update_many(
+        {"user_id": user_id}, {"$set": {"gender": new_gender}}
+    )
     t2 = time.perf_counter()
     return t2 - t1
+
+
+async def benchmark_update_user_mongo_sync(sync, user_id, **fields):
+    """Misst die Schreiblatenz des Benutzer-Updates und die Verzögerung bis zur Aktualisierung der Kopien."""
+    t1 = time.perf_counter()
+    version = await sync.update_user(user_id, **fields)
+    t2 = time.perf_counter()
+    lag = await sync.wait_synced(user_id, version)
+    return t2 - t1, lag
+
+
+# Backend-Schnittstelle für main.run_benchmark_cell, siehe backends.register
+
+DB_SYSTEM = "MongoDB"
+READ_VARIANTS = [
+    ("mongo_agg", "MongoDB-Benchmark (Aggregation)"),
+    ("mongo_python", "MongoDB-Benchmark (Python-Filtern)"),
+]
+
+
+def _db(resources):
+    db = resources.get("db")
+    return get_database() if db is None else db
+
+
+async def prepare(resources):
+    await warm_up()
+
+
+async def clear(resources):
+    db = _db(resources)
+    # drop statt delete_many: auch die Indizes verschwinden, damit jede Zelle ohne
+    # Indexpflege lädt und read_benchmarks danach einen echten Build misst
+    await db.tracking.drop()
+    await db.users.drop()
+    await db.tracks.drop()
+    await db.events.drop()
+    print("Alle MongoDB-Collections samt Indizes gelöscht.")
+
+
+async def load(resources, data):
+    return await load_mongo(_db(resources), *data)
+
+
+async def read_benchmarks(resources, cell, data):
+    db = _db(resources)
+    build_times = await create_indexes(db)
+    print(f"MongoDB-Indizes in {sum(build_times.values()):.3f}s angelegt:")
+    for index, seconds in build_times.items():
+        print(f"  {index}: {seconds:.3f}s")
+    results = []
+    for variant, label in READ_VARIANTS:
+        print(f"\n--- Starte {label} ---")
+        res = await benchmark_mongo(
+            db=db,
+            gender=cell["gender"],
+            group_rounds=cell["group_rounds"],
+            order_by=cell["order_by"],
+            limit=cell["limit"],
+            variant=variant,
+        )
+        plan = await explain_query(
+            db,
+            cell["gender"],
+            cell["group_rounds"],
+            cell["order_by"],
+            cell["limit"],
+            variant,
+        )
+        res["covered"] = plan["covered"]
+        print(f"Plan: {' <- '.join(plan['stages'])} (abgedeckt: {plan['covered']})")
+        results.append(res)
+    return results
+
+
+async def update_benchmarks(resources, user_id, changes):
+    db = _db(resources)
+    sync = DenormalizationSync(db)
+    sync.start()
+    results = []
+    try:
+        for update_run, username, gender in changes:
+            results.append(
+                (
+                    update_run,
+                    "update_username",
+                    await benchmark_update_username_mongo(db, user_id, username),
+                    None,
+                )
+            )
+            results.append(
+                (
+                    update_run,
+                    "update_gender",
+                    await benchmark_update_gender_mongo(db, user_id, gender),
+                    None,
+                )
+            )
+            duration, lag = await benchmark_update_user_mongo_sync(
+                sync, user_id, username=username
+            )
+            results.append((update_run, "update_username_sync", duration, lag))
+            duration, lag = await benchmark_update_user_mongo_sync(
+                sync, user_id, gender=gender
+            )
+            results.append((update_run, "update_gender_sync", duration, lag))
+    finally:
+        await sync.stop()
+    return results
+
+
+async def close(resources):
+    await close_client()
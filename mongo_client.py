@@ -0,0 +1,59 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from pymongo import AsyncMongoClient
+
+load_dotenv(override=True)
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.getenv("MONGO_DB", "test_laufdaten")
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+READ_CONCERN = os.getenv("MONGO_READ_CONCERN", "local")
+
+_client = None
+
+
+def create_client(
+    uri: str = MONGO_URI,
+    max_pool_size: int = MAX_POOL_SIZE,
+    min_pool_size: int = MIN_POOL_SIZE,
+    read_preference: str = READ_PREFERENCE,
+    read_concern: str = READ_CONCERN,
+) -> AsyncMongoClient:
+    return AsyncMongoClient(
+        uri,
+        maxPoolSize=max_pool_size,
+        minPoolSize=min_pool_size,
+        readPreference=read_preference,
+        readConcernLevel=read_concern,
+    )
+
+
+def get_client() -> AsyncMongoClient:
+    """Gemeinsamer asynchroner Client für mongo_filter und mongo_benchmark."""
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
+
+
+def get_database(name: str = DB_NAME):
+    return get_client()[name]
+
+
+async def warm_up(client: AsyncMongoClient = None, connections: int = MIN_POOL_SIZE):
+    """Öffnet vorab Verbindungen im Pool, damit die erste Messung keinen Verbindungsaufbau enthält."""
+    client = client or get_client()
+    await asyncio.gather(
+        *(client.admin.command("ping") for _ in range(max(connections, 1)))
+    )
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,170 @@
+import asyncio
+import time
+from collections import defaultdict
+from itertools import islice
+
+from pymongo import ReturnDocument, UpdateMany
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.05
+
+
+class DenormalizationSync:
+    """Überträgt Änderungen an username/gender gebündelt in die Tracking-Dokumente.
+
+    Änderungen je Benutzer werden bis zum nächsten Flush zusammengefasst. Die
+    veralteten Kopien werden seitenweise über ihre _id ermittelt und per
+    bulk_write mit höchstens batch_size Dokumenten je Aufruf geschrieben, auch
+    bei Benutzern mit sehr vielen Trackings. Jede Kopie trägt user_version,
+    sodass Leser sie mit users.version vergleichen können.
+    """
+
+    def __init__(self, db, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._enqueued_at = defaultdict(dict)
+        self._synced = {}
+        self._lags = {}
+        self._wakeup = asyncio.Event()
+        self._synced_changed = asyncio.Condition()
+        self._task = None
+        self._error = None
+
+    async def update_user(self, user_id, **fields):
+        """Aktualisiert den Benutzer sofort und stellt die Kopien zur Synchronisation ein."""
+        user = await self.db.users.find_one_and_update(
+            {"user_id": user_id},
+            {"$set": fields, "$inc": {"version": 1}},
+            projection={"_id": 0, "version": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if user is None:
+            raise ValueError(f"Benutzer {user_id} nicht gefunden")
+        version = user["version"]
+        self.enqueue(user_id, fields, version)
+        return version
+
+    def enqueue(self, user_id, fields, version):
+        pending = self._pending.setdefault(user_id, {"fields": {}, "version": 0})
+        pending["fields"].update(fields)
+        pending["version"] = max(pending["version"], version)
+        self._enqueued_at[user_id][version] = time.perf_counter()
+        self._wakeup.set()
+
+    def _requeue(self, batch):
+        """Stellt einen nicht geschriebenen Batch wieder ein; seither eingestellte Änderungen haben Vorrang."""
+        for user_id, change in batch:
+            newer = self._pending.get(user_id)
+            if newer is not None:
+                change["fields"].update(newer["fields"])
+                change["version"] = max(change["version"], newer["version"])
+            self._pending[user_id] = change
+
+    async def _stale_ids(self, query, limit):
+        cursor = self.db.tracking.find(query, {"_id": 1}).limit(limit)
+        return [doc["_id"] async for doc in cursor]
+
+    async def _write_changes(self, batch):
+        ops = []
+        n_docs = 0
+        for user_id, change in batch:
+            stale = {"user_version": {"$not": {"$gte": change["version"]}}}
+            update = {"$set": {**change["fields"], "user_version": change["version"]}}
+            while True:
+                ids = await self._stale_ids(
+                    {"user_id": user_id, **stale}, self.batch_size - n_docs
+                )
+                if ids:
+                    ops.append(UpdateMany({"_id": {"$in": ids}, **stale}, update))
+                    n_docs += len(ids)
+                if n_docs < self.batch_size:
+                    break
+                # Batch voll: schreiben, danach liefert die Suche die nächsten veralteten Kopien
+                await self.db.tracking.bulk_write(ops, ordered=False)
+                ops = []
+                n_docs = 0
+        if ops:
+            await self.db.tracking.bulk_write(ops, ordered=False)
+
+    async def flush(self):
+        while self._pending:
+            batch = list(islice(self._pending.items(), self.batch_size))
+            for user_id, _ in batch:
+                del self._pending[user_id]
+            try:
+                await self._write_changes(batch)
+            except BaseException:
+                # Bereits geschriebene Kopien erfüllen den Versionsfilter nicht mehr
+                self._requeue(batch)
+                raise
+            applied_at = time.perf_counter()
+            async with self._synced_changed:
+                for user_id, change in batch:
+                    self._synced[user_id] = max(
+                        self._synced.get(user_id, 0), change["version"]
+                    )
+                    enqueued = self._enqueued_at[user_id]
+                    for version in [v for v in enqueued if v <= change["version"]]:
+                        self._lags[(user_id, version)] = applied_at - enqueued.pop(
+                            version
+                        )
+                self._synced_changed.notify_all()
+
+    async def wait_synced(self, user_id, version):
+        """Wartet, bis die Kopien von user_id mindestens version tragen, und liefert die Propagationsverzögerung.
+
+        Ist der Hintergrund-Flush fehlgeschlagen, wird dessen Fehler ausgelöst.
+        """
+        async with self._synced_changed:
+            await self._synced_changed.wait_for(
+                lambda: self._synced.get(user_id, 0) >= version
+                or self._error is not None
+            )
+            if self._synced.get(user_id, 0) < version:
+                raise self._error
+        return self._lags.pop((user_id, version), 0.0)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as exc:
+                # Änderungen bleiben eingestellt; Wartende erhalten den Fehler statt ewig zu warten
+                print(f"Denormalisierung fehlgeschlagen: {exc!r}")
+                async with self._synced_changed:
+                    self._error = exc
+                    self._synced_changed.notify_all()
+                return
+
+    def start(self):
+        if self._task is None:
+            self._error = None
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Beendet den Hintergrund-Flush und schreibt verbliebene Änderungen; ein früherer Flush-Fehler wird ausgelöst."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        await self.flush()
+
+
+async def stale_tracking_count(db, user_id):
+    """Anzahl der Tracking-Kopien von user_id, die noch nicht auf dem Stand von users.version sind."""
+    user = await db.users.find_one({"user_id": user_id}, {"_id": 0, "version": 1})
+    version = (user or {}).get("version", 0)
+    return await db.tracking.count_documents(
+        {"user_id": user_id, "user_version": {"$not": {"$gte": version}}}
+    )
@@ -1,8 +1,38 @@
 from datetime import time as dt_time, timedelta, date, datetime
+from operator import itemgetter
 
-import polars as pl
-from collections import defaultdict
-import pandas as pd
+import bson
+
+from pagination import decode_cursor
+from result_output import render
+from row_kernels import (
+    ROW_FIELDS,
+    aggregate_columns,
+    aggregate_rows,
+    aggregate_shapes,
+    metres_to_km,
+    row_to_dict,
+    rows_to_columns,
+    totals_to_columns,
+)
+
+TRACKING_PROJECTION = {
+    "_id": 0,
+    "tracking_id": 1,
+    "start_date_time": 1,
+    "time": "$time_seconds",
+    "metres": 1,
+    "event_name": 1,
+    "username": 1,
+}
+BATCH_SIZE = 10000
+_as_totals = itemgetter("_id", "metres_total", "time_total", "rounds")
+
+
+def _as_row(doc):
+    # doc.get wie bisher: Dokumente ohne ein Feld (z.B. event_name) liefern None statt KeyError
+    get = doc.get
+    return tuple([get(field) for field in ROW_FIELDS])
 
 
 def time_to_seconds(val):
@@ -18,15 +48,17 @@ def time_to_seconds(val):
     return 0
 
 
-async def get_tracking_results_mongodb(
+async def build_match_stage(
     db,
     gender: str,
     start_period: date,
     end_period: date,
-    order_by: str = "start",
-    group_rounds: str = "none",
-    limit: int = 100,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
 ):
+    if participants_only and not event_id:
+        raise ValueError("participants_only erfordert eine event_id")
     match_stage = {
         "start_date_time": {
             "$gte": datetime.combine(start_period, datetime.min.time()),
@@ -35,48 +67,161 @@ async def get_tracking_results_mongodb(
     }
     if gender:
         match_stage["gender"] = gender
+    if event_id:
+        match_stage["event_id"] = event_id
+    user_ids = None
+    if club_id:
+        # Vereinszugehörigkeit steht wie in SQL (User.club_id) nur am Benutzer, nicht in den Trackings
+        user_ids = await db.users.distinct("user_id", {"club_id": club_id})
+    if participants_only:
+        participants = await db.event_participants.distinct(
+            "user_id", {"event_id": event_id}
+        )
+        if user_ids is None:
+            user_ids = participants
+        else:
+            members = set(user_ids)
+            user_ids = [u for u in participants if u in members]
+    if user_ids is not None:
+        match_stage["user_id"] = {"$in": user_ids}
+    return match_stage
+
+
+def group_all_stages(limit):
+    stages = [
+        {
+            "$group": {
+                "_id": "$username",
+                "metres_total": {"$sum": "$metres"},
+                "time_total": {"$sum": {"$toDouble": "$time_seconds"}},
+                "rounds": {"$sum": 1},
+            }
+        },
+        {"$sort": {"metres_total": -1}},
+    ]
+    if limit:
+        stages.append({"$limit": limit})
+    return stages
+
+
+def _group_all_result(doc):
+    return {
+        "username": doc["_id"],
+        "km_total": metres_to_km(doc["metres_total"]),
+        "time_total": doc["time_total"],
+        "rounds": doc["rounds"],
+    }
+
+
+def _sorted_rows_stages(order_by, limit):
+    sort_field = "start_date_time" if order_by == "start" else "time_seconds"
+    sort_dir = -1 if order_by == "start" else 1
+    stages = [{"$sort": {sort_field: sort_dir, "tracking_id": sort_dir}}]
+    if limit:
+        stages.append({"$limit": limit})
+    stages.append({"$project": TRACKING_PROJECTION})
+    return stages
+
+
+async def get_tracking_results_mongodb(
+    db,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    order_by: str = "start",
+    group_rounds: str = "none",
+    limit: int = 100,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+    cursor: str = None,
+    batch_size: int = BATCH_SIZE,
+    output: str = "dicts",
+):
+    if cursor and group_rounds == "all":
+        raise ValueError("cursor wird für group_rounds='all' nicht unterstützt")
+    match_stage = await build_match_stage(
+        db, gender, start_period, end_period, event_id, club_id, participants_only
+    )
     if group_rounds == "all":
-        pipeline = [
-            {"$match": match_stage},
-            {
-                "$group": {
-                    "_id": "$username",
-                    "km_total": {"$sum": "$km"},
-                    "time_total": {"$sum": {"$toDouble": "$time_seconds"}},
-                    "rounds": {"$sum": 1},
-                }
-            },
-            {"$sort": {"km_total": -1}},
-            {"$limit": limit},
-        ]
-        cursor = db.tracking.aggregate(pipeline)
-        results = []
-        async for doc in cursor:
-            results.append(
-                {
-                    "username": doc["_id"],
-                    "km_total": doc["km_total"],
-                    "time_total": doc["time_total"],
-                    "rounds": doc["rounds"],
-                }
+        cursor = db.tracking.aggregate(
+            [{"$match": match_stage}, *group_all_stages(limit)]
+        )
+        if output != "dicts":
+            return render(
+                totals_to_columns([_as_totals(doc) async for doc in cursor]), output
             )
-        return results
+        return [_group_all_result(doc) async for doc in cursor]
     sort_field = "start_date_time" if order_by == "start" else "time_seconds"
     sort_dir = -1 if order_by == "start" else 1
-    cursor = db.tracking.find(match_stage).sort(sort_field, sort_dir).limit(limit)
-    results = []
-    async for doc in cursor:
-        results.append(
-            {
-                "tracking_id": doc.get("tracking_id"),
-                "start_date_time": doc.get("start_date_time"),
-                "time": doc.get("time_seconds"),
-                "km": doc.get("km"),
-                "event_name": doc.get("event_name"),
-                "username": doc.get("username"),
-            }
-        )
-    return results
+    if cursor:
+        key, tracking_id = decode_cursor(cursor, order_by)
+        op = "$lt" if sort_dir == -1 else "$gt"
+        match_stage = {
+            "$and": [
+                match_stage,
+                {
+                    "$or": [
+                        {sort_field: {op: key}},
+                        {sort_field: key, "tracking_id": {op: tracking_id}},
+                    ]
+                },
+            ]
+        }
+    docs = (
+        db.tracking.find(match_stage, TRACKING_PROJECTION, batch_size=batch_size)
+        .sort([(sort_field, sort_dir), ("tracking_id", sort_dir)])
+        .limit(limit or 0)
+    )
+    if output != "dicts":
+        rows = [_as_row(doc) async for doc in docs]
+        return render(rows_to_columns(rows, time_to_seconds), output)
+    return [row_to_dict(_as_row(doc)) async for doc in docs]
+
+
+async def fetch_tracking_tuples(
+    db,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+    batch_size: int = BATCH_SIZE,
+):
+    """Lädt die projizierten Trackings als Tupel in ROW_FIELDS-Reihenfolge statt als Dokumente."""
+    match_stage = await build_match_stage(
+        db, gender, start_period, end_period, event_id, club_id, participants_only
+    )
+    cursor = db.tracking.find(match_stage, TRACKING_PROJECTION, batch_size=batch_size)
+    return [_as_row(doc) async for doc in cursor]
+
+
+async def fetch_tracking_columns(
+    db,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+    batch_size: int = BATCH_SIZE,
+):
+    """Lädt die Trackings als rohe BSON-Batches und dekodiert sie direkt in Spalten."""
+    match_stage = await build_match_stage(
+        db, gender, start_period, end_period, event_id, club_id, participants_only
+    )
+    columns = {field: [] for field in ROW_FIELDS}
+    targets = [(columns[field].append, field) for field in ROW_FIELDS]
+    batches = db.tracking.find_raw_batches(
+        match_stage, TRACKING_PROJECTION, batch_size=batch_size
+    )
+    async for batch in batches:
+        # decode_iter hält nur das aktuelle Dokument, decode_all eine Liste des ganzen Batches
+        for doc in bson.decode_iter(batch):
+            for append, field in targets:
+                append(doc.get(field))
+    return columns
 
 
 async def get_tracking_results_mongodb_python(
@@ -87,83 +232,96 @@ async def get_tracking_results_mongodb_python(
     order_by: str = "start",
     group_rounds: str = "none",
     limit: int = 100,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+    batch_size: int = BATCH_SIZE,
+    output: str = "dicts",
 ):
-    match_stage = {
-        "start_date_time": {
-            "$gte": datetime.combine(start_period, datetime.min.time()),
-            "$lte": datetime.combine(end_period, datetime.max.time()),
-        }
-    }
-    if gender:
-        match_stage["gender"] = gender
-
-    cursor = db.tracking.find(match_stage)
-    rows = []
-    async for doc in cursor:
-        rows.append(
-            {
-                "tracking_id": doc.get("tracking_id"),
-                "start_date_time": doc.get("start_date_time"),
-                "time": doc.get("time_seconds"),
-                "km": doc.get("km"),
-                "event_name": doc.get("event_name"),
-                "username": doc.get("username"),
-            }
+    rows = await fetch_tracking_tuples(
+        db,
+        gender,
+        start_period,
+        end_period,
+        event_id,
+        club_id,
+        participants_only,
+        batch_size,
+    )
+    if output != "dicts":
+        columns = aggregate_columns(
+            rows, group_rounds, order_by, limit, time_to_seconds
         )
+        return render(columns, output)
     if not rows:
         return []
-    if group_rounds == "all":
-        grouped = defaultdict(
-            lambda: {"username": None, "km_total": 0, "time_total": 0, "rounds": 0}
-        )
-        for row in rows:
-            username = row["username"]
-            time_sec = time_to_seconds(row["time"])
-            if grouped[username]["username"] is None:
-                grouped[username]["username"] = username
-            grouped[username]["km_total"] += row["km"]
-            grouped[username]["time_total"] += time_sec
-            grouped[username]["rounds"] += 1
-        result_list = list(grouped.values())
-        result_list.sort(key=lambda g: g["km_total"], reverse=True)
-        return result_list[:limit]
-
-    if group_rounds == "behind":
-        rows.sort(key=lambda r: (r["username"], r["start_date_time"]))
-        results = []
-        current_group = None
-        for row in rows:
-            time_sec = time_to_seconds(row["time"])
-            if (not current_group) or (current_group["username"] != row["username"]):
-                if current_group:
-                    results.append(current_group)
-                current_group = row.copy()
-                current_group["time"] = time_sec
-                current_group["rounds"] = 1
-            else:
-                group_end = current_group["start_date_time"] + timedelta(
-                    seconds=current_group["time"]
-                )
-                time_diff = abs((group_end - row["start_date_time"]).total_seconds())
-                if time_diff <= 1:
-                    current_group["time"] += time_sec
-                    current_group["rounds"] += 1
-                else:
-                    results.append(current_group)
-                    current_group = row.copy()
-                    current_group["time"] = time_sec
-                    current_group["rounds"] = 1
-        if current_group:
-            results.append(current_group)
-        if order_by == "start":
-            results.sort(key=lambda g: g["start_date_time"], reverse=True)
-        else:
-            results.sort(key=lambda g: (-g["rounds"], g["time"]))
-        return results[:limit]
+    return aggregate_rows(rows, group_rounds, order_by, limit, time_to_seconds)
+
 
-    if group_rounds == "none":
-        if order_by == "start":
-            rows.sort(key=lambda r: r["start_date_time"], reverse=True)
+async def get_tracking_results_mongodb_batch(
+    db,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    shapes,
+    limit: int = 100,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+):
+    """Wertet mehrere (group_rounds, order_by)-Formen in einer $facet-Pipeline über einen einzigen $match aus.
+
+    Wie get_tracking_results_mongodb liefert "behind" die sortierten Einzelrunden.
+    Das Ergebnis ist ein einzelnes Dokument und unterliegt damit der 16-MB-Grenze.
+    """
+    match_stage = await build_match_stage(
+        db, gender, start_period, end_period, event_id, club_id, participants_only
+    )
+    facets = {}
+    names = {}
+    for group_rounds, order_by in shapes:
+        if group_rounds == "all":
+            name = "all"
+            facets[name] = group_all_stages(limit)
         else:
-            rows.sort(key=lambda r: time_to_seconds(r["time"]))
-        return rows[:limit]
+            name = f"rows_{order_by}"
+            facets[name] = _sorted_rows_stages(order_by, limit)
+        names[(group_rounds, order_by)] = name
+    cursor = db.tracking.aggregate([{"$match": match_stage}, {"$facet": facets}])
+    facet_doc = {}
+    async for doc in cursor:
+        facet_doc = doc
+    results = {}
+    for shape, name in names.items():
+        docs = facet_doc.get(name, [])
+        if name == "all":
+            results[shape] = [_group_all_result(doc) for doc in docs]
+        else:
+            results[shape] = [row_to_dict(_as_row(doc)) for doc in docs]
+    return results
+
+
+async def get_tracking_results_mongodb_python_batch(
+    db,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    shapes,
+    limit: int = 100,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+    batch_size: int = BATCH_SIZE,
+):
+    """Wertet mehrere (group_rounds, order_by)-Formen in Python über einen einzigen Fetch aus."""
+    rows = await fetch_tracking_tuples(
+        db,
+        gender,
+        start_period,
+        end_period,
+        event_id,
+        club_id,
+        participants_only,
+        batch_size,
+    )
+    return aggregate_shapes(rows, shapes, limit, time_to_seconds)
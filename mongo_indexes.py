@@ -0,0 +1,178 @@
+import os
+import time
+from datetime import date, datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+import mongo_filter
+
+PARTIAL_INDEX_SINCE = datetime.fromisoformat(
+    os.getenv("MONGO_PARTIAL_INDEX_SINCE", "2010-01-01")
+)
+HOT_WINDOW = {"start_date_time": {"$gte": PARTIAL_INDEX_SINCE}}
+# restliche Felder der Zeilenprojektion, die abdeckende Indizes mitführen
+ROW_KEYS = [
+    ("time_seconds", ASCENDING),
+    ("metres", ASCENDING),
+    ("event_name", ASCENDING),
+    ("username", ASCENDING),
+]
+
+# Deklarative Index-Spezifikation je Collection: name -> keys und optionale IndexModel-Argumente
+INDEX_SPEC = {
+    "tracking": {
+        "event_start": {
+            "keys": [("event_id", ASCENDING), ("start_date_time", DESCENDING)],
+            "partialFilterExpression": {"event_id": {"$exists": True}},
+        },
+        "start_tracking": {
+            "keys": [("start_date_time", DESCENDING), ("tracking_id", DESCENDING)],
+        },
+        "time_tracking": {
+            "keys": [("time_seconds", ASCENDING), ("tracking_id", ASCENDING)],
+        },
+        "gender_start": {
+            "keys": [("gender", ASCENDING), ("start_date_time", DESCENDING)],
+        },
+        "gender_time": {
+            "keys": [("gender", ASCENDING), ("time_seconds", ASCENDING)],
+        },
+        "user_version": {
+            "keys": [("user_id", ASCENDING), ("user_version", ASCENDING)],
+        },
+        # Partielle, abdeckende Varianten für das heiße Zeitfenster (kein FETCH)
+        "gender_start_totals_covered": {
+            "keys": [
+                ("gender", ASCENDING),
+                ("start_date_time", DESCENDING),
+                ("username", ASCENDING),
+                ("metres", ASCENDING),
+                ("time_seconds", ASCENDING),
+            ],
+            "partialFilterExpression": HOT_WINDOW,
+        },
+        "gender_start_rows_covered": {
+            "keys": [
+                ("gender", ASCENDING),
+                ("start_date_time", DESCENDING),
+                ("tracking_id", DESCENDING),
+                *ROW_KEYS,
+            ],
+            "partialFilterExpression": HOT_WINDOW,
+        },
+        "gender_time_rows_covered": {
+            "keys": [
+                ("gender", ASCENDING),
+                ("time_seconds", ASCENDING),
+                ("tracking_id", ASCENDING),
+                ("start_date_time", ASCENDING),
+                *ROW_KEYS,
+            ],
+            "partialFilterExpression": HOT_WINDOW,
+        },
+    },
+    "users": {
+        "user_id": {"keys": [("user_id", ASCENDING)], "unique": True},
+        "gender": {"keys": [("gender", ASCENDING)]},
+        # Auflösung des Vereinsfilters (build_match_stage) auf user_ids
+        "club_user": {"keys": [("club_id", ASCENDING), ("user_id", ASCENDING)]},
+    },
+    "event_participants": {
+        "event_user": {
+            "keys": [("event_id", ASCENDING), ("user_id", ASCENDING)],
+            "unique": True,
+        },
+    },
+}
+
+
+def index_models(spec=INDEX_SPEC):
+    return {
+        collection: [
+            IndexModel(
+                options["keys"],
+                name=name,
+                **{k: v for k, v in options.items() if k != "keys"},
+            )
+            for name, options in indexes.items()
+        ]
+        for collection, indexes in spec.items()
+    }
+
+
+async def create_indexes(db, spec=INDEX_SPEC):
+    """Legt die Indizes der Spezifikation an und liefert die Build-Zeit je Index in Sekunden."""
+    build_times = {}
+    for collection, models in index_models(spec).items():
+        for model in models:
+            t1 = time.perf_counter()
+            await db[collection].create_indexes([model])
+            build_times[f"{collection}.{model.document['name']}"] = (
+                time.perf_counter() - t1
+            )
+    return build_times
+
+
+def plan_stages(explain):
+    """Sammelt die Stage-Namen und Indexnamen aller winningPlan-Bäume einer explain-Ausgabe."""
+    stages = []
+    indexes = []
+
+    def walk(node, in_plan=False):
+        if isinstance(node, dict):
+            if in_plan and "stage" in node:
+                stages.append(node["stage"])
+                if "indexName" in node:
+                    indexes.append(node["indexName"])
+            for key, value in node.items():
+                walk(value, in_plan or key in ("winningPlan", "queryPlan"))
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, in_plan)
+
+    walk(explain)
+    return stages, indexes
+
+
+def is_covered(stages):
+    return bool(stages) and not {"FETCH", "COLLSCAN"} & set(stages)
+
+
+async def explain_query(
+    db,
+    gender,
+    group_rounds,
+    order_by,
+    limit,
+    variant="mongo_agg",
+    start_period=date(2010, 1, 1),
+    end_period=date(2025, 12, 31),
+):
+    """Erklärt die Abfrage einer Benchmark-Variante und meldet, ob sie ohne FETCH aus dem Index beantwortet wird."""
+    match_stage = await mongo_filter.build_match_stage(
+        db, gender, start_period, end_period
+    )
+    if variant == "mongo_agg" and group_rounds == "all":
+        command = {
+            "aggregate": "tracking",
+            "pipeline": [
+                {"$match": match_stage},
+                *mongo_filter.group_all_stages(limit),
+            ],
+            "cursor": {},
+        }
+    else:
+        command = {
+            "find": "tracking",
+            "filter": match_stage,
+            "projection": mongo_filter.TRACKING_PROJECTION,
+        }
+        if variant == "mongo_agg":
+            sort_field = "start_date_time" if order_by == "start" else "time_seconds"
+            sort_dir = -1 if order_by == "start" else 1
+            command["sort"] = {sort_field: sort_dir, "tracking_id": sort_dir}
+            if limit:
+                command["limit"] = limit
+    explain = await db.command("explain", command, verbosity="queryPlanner")
+    stages, indexes = plan_stages(explain)
+    return {"stages": stages, "indexes": indexes, "covered": is_covered(stages)}
@@ -0,0 +1,38 @@
+import base64
+import json
+from datetime import datetime, timedelta, time as dt_time
+from typing import List, Dict, Any, Optional
+
+
+def encode_cursor(row: Dict[str, Any], order_by: str = "start") -> str:
+    """Kodiert (Sortierschlüssel, tracking_id) der letzten Zeile als opaken Cursor."""
+    if order_by == "start":
+        key = row["start_date_time"].isoformat()
+    else:
+        key = float(row["time"])
+    payload = json.dumps([key, str(row["tracking_id"])])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, order_by: str = "start"):
+    try:
+        key, tracking_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if order_by == "start":
+            key = datetime.fromisoformat(key)
+        else:
+            key = float(key)
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"Ungültiger Cursor: {cursor!r}") from exc
+    return key, tracking_id
+
+
+def next_cursor(
+    results: List[Dict[str, Any]], order_by: str, limit: int
+) -> Optional[str]:
+    if not results or len(results) < limit:
+        return None
+    return encode_cursor(results[-1], order_by)
+
+
+def seconds_to_time(seconds: float) -> dt_time:
+    return (datetime.min + timedelta(seconds=seconds)).time()
@@ -0,0 +1,224 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import shared_memory
+from typing import List, Dict, Any
+
+import numpy as np
+
+import sqlalchemy_filter
+import mongo_filter
+from sqlalchemy_filter import time_to_seconds
+from row_kernels import ROW_FIELDS, metres_to_km, row_to_dict
+
+NUMERIC_COLUMNS = {
+    "user": np.int64,
+    "start": np.float64,
+    "time": np.float64,
+    "metres": np.int64,
+}
+
+_executor = None
+_executor_workers = None
+
+
+def _get_executor(workers):
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _executor_workers = workers
+    return _executor
+
+
+def rows_to_columns(rows) -> Dict[str, List[Any]]:
+    return {field: [row[field] for row in rows] for field in ROW_FIELDS}
+
+
+def numeric_columns(columns: Dict[str, List[Any]]) -> Dict[str, Any]:
+    """Leitet aus den Tracking-Spalten die NumPy-Arrays für die Worker ab."""
+    user_codes = {}
+    n = len(columns["username"])
+    return {
+        "user": np.fromiter(
+            (user_codes.setdefault(u, len(user_codes)) for u in columns["username"]),
+            dtype=np.int64,
+            count=n,
+        ),
+        "start": np.fromiter(
+            (s.timestamp() for s in columns["start_date_time"]),
+            dtype=np.float64,
+            count=n,
+        ),
+        "time": np.fromiter(
+            (time_to_seconds(t) for t in columns["time"]), dtype=np.float64, count=n
+        ),
+        "metres": np.fromiter(columns["metres"], dtype=np.int64, count=n),
+        "usernames": list(user_codes),
+    }
+
+
+def _row(columns, i):
+    return row_to_dict([columns[field][i] for field in ROW_FIELDS])
+
+
+def _attach(handles, n):
+    blocks = {}
+    arrays = {}
+    for name, shm_name in handles.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        blocks[name] = shm
+        arrays[name] = np.ndarray((n,), dtype=NUMERIC_COLUMNS[name], buffer=shm.buf)
+    return blocks, arrays
+
+
+def _aggregate_partition(handles, n, group_rounds, partition, n_partitions):
+    blocks, arrays = _attach(handles, n)
+    try:
+        user = arrays["user"]
+        idx = np.flatnonzero(user % n_partitions == partition)
+        if group_rounds == "all":
+            codes, inverse = np.unique(user[idx], return_inverse=True)
+            # bincount summiert in float64, für ganze Meter bis 2**53 exakt
+            return (
+                codes,
+                np.bincount(inverse, weights=arrays["metres"][idx]),
+                np.bincount(inverse, weights=arrays["time"][idx]),
+                np.bincount(inverse),
+            )
+        idx = idx[np.lexsort((arrays["start"][idx], user[idx]))]
+        users = user[idx].tolist()
+        starts = arrays["start"][idx].tolist()
+        times = arrays["time"][idx].tolist()
+        rows = idx.tolist()
+        groups = []
+        current = None
+        for i in range(len(rows)):
+            if current is not None and current[0] == users[i]:
+                if abs(current[2] + current[3] - starts[i]) <= 1:
+                    current[3] += times[i]
+                    current[4] += 1
+                    continue
+            if current is not None:
+                groups.append((current[1], current[3], current[4]))
+            current = [users[i], rows[i], starts[i], times[i], 1]
+        if current is not None:
+            groups.append((current[1], current[3], current[4]))
+        return groups
+    finally:
+        for shm in blocks.values():
+            shm.close()
+
+
+def aggregate_parallel(
+    columns: Dict[str, Any],
+    group_rounds: str,
+    order_by: str,
+    limit,
+    workers: int = None,
+) -> List[Dict[str, Any]]:
+    """Gruppiert "all"/"behind" in einem Prozesspool über Shared-Memory-Spalten, partitioniert nach Benutzer."""
+    n = len(columns["username"])
+    if n == 0:
+        return []
+    arrays = numeric_columns(columns)
+    if group_rounds == "none":
+        if order_by == "start":
+            order = np.argsort(-arrays["start"], kind="stable")
+        else:
+            order = np.argsort(arrays["time"], kind="stable")
+        return [_row(columns, i) for i in order[:limit].tolist()]
+    workers = workers or os.cpu_count()
+    blocks = {}
+    try:
+        for name, dtype in NUMERIC_COLUMNS.items():
+            array = np.ascontiguousarray(arrays[name], dtype=dtype)
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray((n,), dtype=dtype, buffer=shm.buf)[:] = array
+            blocks[name] = shm
+        handles = {name: shm.name for name, shm in blocks.items()}
+        executor = _get_executor(workers)
+        futures = [
+            executor.submit(
+                _aggregate_partition, handles, n, group_rounds, partition, workers
+            )
+            for partition in range(workers)
+        ]
+        partials = [future.result() for future in futures]
+    finally:
+        for shm in blocks.values():
+            shm.close()
+            shm.unlink()
+
+    if group_rounds == "all":
+        usernames = arrays["usernames"]
+        result_list = []
+        for codes, metres_total, time_total, rounds in partials:
+            for code, metres, t, r in zip(
+                codes.tolist(),
+                metres_total.tolist(),
+                time_total.tolist(),
+                rounds.tolist(),
+            ):
+                result_list.append(
+                    {
+                        "username": usernames[code],
+                        "km_total": metres_to_km(int(metres)),
+                        "time_total": t,
+                        "rounds": r,
+                    }
+                )
+        result_list.sort(key=lambda g: g["km_total"], reverse=True)
+        return result_list[:limit]
+
+    groups = [group for partial in partials for group in partial]
+    start = arrays["start"].tolist()
+    username = columns["username"]
+    groups.sort(key=lambda g: (username[g[0]], start[g[0]]))
+    if order_by == "start":
+        groups.sort(key=lambda g: start[g[0]], reverse=True)
+    else:
+        groups.sort(key=lambda g: (-g[2], g[1]))
+    results = []
+    for row_index, time_total, rounds in groups[:limit]:
+        group = _row(columns, row_index)
+        group["time"] = time_total
+        group["rounds"] = rounds
+        results.append(group)
+    return results
+
+
+async def get_tracking_results_python_parallel(
+    session,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    order_by: str = "start",
+    group_rounds: str = "none",
+    limit: int = 100,
+    workers: int = None,
+    **filters,
+) -> List[Dict[str, Any]]:
+    rows = await sqlalchemy_filter.fetch_tracking_rows(
+        session, gender, start_period, end_period, **filters
+    )
+    columns = rows_to_columns([row._mapping for row in rows])
+    return aggregate_parallel(columns, group_rounds, order_by, limit, workers)
+
+
+async def get_tracking_results_mongodb_python_parallel(
+    db,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    order_by: str = "start",
+    group_rounds: str = "none",
+    limit: int = 100,
+    workers: int = None,
+    **filters,
+) -> List[Dict[str, Any]]:
+    columns = await mongo_filter.fetch_tracking_columns(
+        db, gender, start_period, end_period, **filters
+    )
+    return aggregate_parallel(columns, group_rounds, order_by, limit, workers)
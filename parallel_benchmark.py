@@ -0,0 +1,97 @@
+import asyncio
+import csv
+import os
+import random
+import time
+from datetime import date, datetime, timedelta, time as dt_time
+
+from sqlalchemy_filter import get_tracking_results_python
+from parallel_aggregation import get_tracking_results_python_parallel
+from bench_fixtures import DummySession
+
+ROW_COUNTS = [10000, 100000, 300000, 1000000, 3000000]
+GROUP_ROUNDS = ["all", "behind"]
+N_USERS = 1000
+SEED = 42
+CSV_FILE_PARALLEL = "benchmark_parallel_results.csv"
+
+
+def generate_rows(n_rows, n_users=N_USERS, seed=SEED):
+    rng = random.Random(seed)
+    usernames = [f"user_{i}" for i in range(n_users)]
+    base = datetime(2024, 1, 1)
+    rows = []
+    for i in range(n_rows):
+        lap = rng.randint(600, 1800)
+        rows.append(
+            {
+                "tracking_id": i,
+                "start_date_time": base + timedelta(seconds=rng.randint(0, 63072000)),
+                "time": dt_time(minute=lap // 60, second=lap % 60),
+                "metres": rng.randint(40, 1000) * 10,
+                "event_name": "E1",
+                "username": rng.choice(usernames),
+            }
+        )
+    return rows
+
+
+def find_crossover(measurements):
+    """Kleinste Zeilenzahl, ab der die parallele Variante bei allen größeren Läufen schneller ist."""
+    crossover = None
+    for n_rows, single, parallel in sorted(measurements, reverse=True):
+        if parallel >= single:
+            break
+        crossover = n_rows
+    return crossover
+
+
+async def main():
+    workers = os.cpu_count()
+    with open(CSV_FILE_PARALLEL, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(
+            [
+                "timestamp",
+                "group_rounds",
+                "n_rows",
+                "workers",
+                "single_duration",
+                "parallel_duration",
+            ]
+        )
+        measurements = {group_rounds: [] for group_rounds in GROUP_ROUNDS}
+        for n_rows in ROW_COUNTS:
+            session = DummySession(generate_rows(n_rows))
+            for group_rounds in GROUP_ROUNDS:
+                args = (session, None, date(2010, 1, 1), date(2025, 12, 31))
+                t1 = time.perf_counter()
+                await get_tracking_results_python(*args, "best", group_rounds, 100)
+                t2 = time.perf_counter()
+                await get_tracking_results_python_parallel(
+                    *args, "best", group_rounds, 100, workers=workers
+                )
+                t3 = time.perf_counter()
+                measurements[group_rounds].append((n_rows, t2 - t1, t3 - t2))
+                writer.writerow(
+                    [
+                        datetime.now().isoformat(),
+                        group_rounds,
+                        n_rows,
+                        workers,
+                        t2 - t1,
+                        t3 - t2,
+                    ]
+                )
+                csvfile.flush()
+                print(
+                    f"{group_rounds:>6} {n_rows:>8} Zeilen: single={t2 - t1:.3f}s parallel={t3 - t2:.3f}s"
+                )
+    for group_rounds, values in measurements.items():
+        print(
+            f"Crossover '{group_rounds}' ({workers} Worker): ab {find_crossover(values)} Zeilen"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# pyarrow und orjson werden erst beim Rendern importiert; die Filtermodule laden
+# dieses Modul immer, reine "dicts"-Läufe sollen dafür nicht bezahlen.
+
+# "dicts" ist die bisherige Liste von Dicts; "arrow" und "json" werden spaltenweise gebaut
+OUTPUTS = ("dicts", "arrow", "json")
+
+
+@lru_cache(maxsize=None)
+def field_types():
+    import pyarrow as pa
+
+    return {
+        "start_date_time": pa.timestamp("us"),
+        "time": pa.float64(),
+        "km": pa.float64(),
+        "event_name": pa.string(),
+        "username": pa.string(),
+        "rounds": pa.int64(),
+        "km_total": pa.float64(),
+        "time_total": pa.float64(),
+    }
+
+
+def _normalize(values: List[Any]) -> List[Any]:
+    """Wandelt eine Spalte einmalig in Arrow-/JSON-taugliche Werte (UUID, Decimal, timedelta)."""
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, uuid.UUID):
+        convert = str
+    elif isinstance(sample, Decimal):
+        convert = float
+    elif isinstance(sample, timedelta):
+        convert = timedelta.total_seconds
+    else:
+        return values
+    return [None if v is None else convert(v) for v in values]
+
+
+def json_default(value):
+    """orjson-Fallback für die zeilenweise Serialisierung von Dict-Ergebnissen."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Nicht serialisierbar: {type(value).__name__}")
+
+
+def dicts_to_json(results: List[Dict[str, Any]]) -> bytes:
+    import orjson
+
+    return orjson.dumps(results, default=json_default)
+
+
+def to_record_batch(columns: Dict[str, List[Any]]) -> "pa.RecordBatch":
+    import pyarrow as pa
+
+    types = field_types()
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(_normalize(values), type=types.get(name))
+            for name, values in columns.items()
+        ],
+        names=list(columns),
+    )
+
+
+def to_ipc_bytes(batch: "pa.RecordBatch") -> bytes:
+    """Serialisiert einen RecordBatch im Arrow-IPC-Streamformat."""
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def to_json(columns: Dict[str, List[Any]]) -> bytes:
+    """Spaltenweises JSON ({feld: [werte]}); datetime und str serialisiert orjson ohne Python-Umweg."""
+    import orjson
+
+    return orjson.dumps({name: _normalize(values) for name, values in columns.items()})
+
+
+def render(columns: Dict[str, List[Any]], output: str):
+    if output == "arrow":
+        return to_record_batch(columns)
+    if output == "json":
+        return to_json(columns)
+    raise ValueError(f"Unbekanntes Ausgabeformat: {output!r}")
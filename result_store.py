@@ -0,0 +1,116 @@
+import os
+import subprocess
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any
+
+RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", "benchmark_results")
+BATCH_SIZE = 1000
+PARTITION_COLUMNS = ["run_id", "git_commit"]
+
+
+def current_git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def new_run_id() -> str:
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+class ResultStore:
+    """Sammelt Messzeilen und schreibt sie gebündelt als Parquet, partitioniert nach run_id und git_commit."""
+
+    def __init__(
+        self,
+        table: str,
+        columns: List[str],
+        root: str = RESULTS_DIR,
+        run_id: str = None,
+        git_commit: str = None,
+        batch_size: int = BATCH_SIZE,
+    ):
+        self.path = os.path.join(root, table)
+        self.columns = list(columns)
+        self.run_id = run_id or new_run_id()
+        self.git_commit = git_commit or current_git_commit()
+        self.batch_size = batch_size
+        self._rows = []
+
+    def append(self, row):
+        if not isinstance(row, dict):
+            row = dict(zip(self.columns, row))
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if not self._rows:
+            return
+        # pyarrow erst beim Schreiben laden, damit "import main" ohne es startet
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = {
+            column: [row.get(column) for row in self._rows] for column in self.columns
+        }
+        columns["run_id"] = [self.run_id] * len(self._rows)
+        columns["git_commit"] = [self.git_commit] * len(self._rows)
+        pq.write_to_dataset(
+            pa.table(columns),
+            root_path=self.path,
+            partition_cols=PARTITION_COLUMNS,
+        )
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def load_results(
+    table: str, root: str = RESULTS_DIR, run_ids=None
+) -> List[Dict[str, Any]]:
+    # pyarrow.dataset lädt pandas mit; nur zum Lesen benötigt
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    path = os.path.join(root, table)
+    if not os.path.isdir(path):
+        return []
+    files = ds.dataset(path, format="parquet", partitioning="hive").files
+    schema = pa.unify_schemas(
+        [pq.read_schema(f) for f in files]
+        + [pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS])],
+        promote_options="permissive",
+    )
+    dataset = ds.dataset(path, schema=schema, format="parquet", partitioning="hive")
+    expression = None
+    if run_ids:
+        expression = ds.field("run_id").isin(list(run_ids))
+    return dataset.to_table(filter=expression).to_pylist()
+
+
+def list_runs(table: str, root: str = RESULTS_DIR) -> List[str]:
+    path = os.path.join(root, table)
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        entry.split("=", 1)[1]
+        for entry in os.listdir(path)
+        if entry.startswith("run_id=")
+    )
@@ -0,0 +1,216 @@
+import heapq
+from decimal import Decimal
+from operator import itemgetter
+from typing import List, Dict, Any, Tuple
+
+# Positionen in Zeilen der Form ROW_FIELDS
+TRACKING_ID, START, TIME, KM, EVENT_NAME, USERNAME = range(6)
+# Felder der Ergebniszeilen
+TRACKING_FIELDS = (
+    "tracking_id",
+    "start_date_time",
+    "time",
+    "km",
+    "event_name",
+    "username",
+)
+# Felder der geladenen Zeilen: die Strecke kommt als ganze Meter, km erst in der Ausgabe
+ROW_FIELDS = TRACKING_FIELDS[:KM] + ("metres",) + TRACKING_FIELDS[KM + 1 :]
+# Felder der Ergebniszeilen von group_rounds="all"
+TOTALS_FIELDS = ("username", "km_total", "time_total", "rounds")
+METRES_PER_KM = 1000
+
+
+def km_to_metres(km) -> int:
+    """Wandelt eine Strecke in km (Decimal, float, int oder str) in ganze Meter um."""
+    if isinstance(km, float):
+        # 0.57 * 1000 ergibt 570.0000000000001, round() liefert den exakten Meterwert
+        return round(km * METRES_PER_KM)
+    return int(Decimal(km) * METRES_PER_KM)
+
+
+def metres_to_km(metres) -> float:
+    """Ausgabegrenze: ganze Meter als km; entspricht float() des exakten Dezimalwerts."""
+    return metres / METRES_PER_KM
+
+
+class _Totals:
+    __slots__ = ("km_total", "time_total", "rounds")
+
+    def __init__(self):
+        self.km_total = 0
+        self.time_total = 0
+        self.rounds = 0
+
+
+class _Chain:
+    __slots__ = ("row", "time", "rounds")
+
+    def __init__(self, row, time_sec):
+        self.row = row
+        self.time = time_sec
+        self.rounds = 1
+
+
+def row_to_dict(row) -> Dict[str, Any]:
+    """Baut aus einer Zeile in ROW_FIELDS-Reihenfolge die Ergebniszeile mit km."""
+    result = dict(zip(TRACKING_FIELDS, row))
+    result["km"] = metres_to_km(row[KM])
+    return result
+
+
+def _top(items, key, limit, reverse=False):
+    # nsmallest/nlargest entsprechen sorted(...)[:limit] einschließlich Reihenfolge bei Gleichstand
+    if limit is None:
+        return sorted(items, key=key, reverse=reverse)
+    if reverse:
+        return heapq.nlargest(limit, items, key=key)
+    return heapq.nsmallest(limit, items, key=key)
+
+
+def _top_totals(rows, limit, to_seconds):
+    grouped = {}
+    for row in rows:
+        totals = grouped.get(row[USERNAME])
+        if totals is None:
+            totals = grouped[row[USERNAME]] = _Totals()
+        totals.km_total += row[KM]
+        totals.time_total += to_seconds(row[TIME])
+        totals.rounds += 1
+    return _top(grouped.items(), lambda g: g[1].km_total, limit, reverse=True)
+
+
+def _group_all(rows, limit, to_seconds):
+    return [
+        {
+            "username": username,
+            "km_total": metres_to_km(totals.km_total),
+            "time_total": totals.time_total,
+            "rounds": totals.rounds,
+        }
+        for username, totals in _top_totals(rows, limit, to_seconds)
+    ]
+
+
+def _chain_rows(rows, to_seconds):
+    chains = []
+    current = None
+    for row in sorted(rows, key=itemgetter(USERNAME, START)):
+        time_sec = to_seconds(row[TIME])
+        if (
+            current is not None
+            and current.row[USERNAME] == row[USERNAME]
+            # Kettenende = Start der ersten Runde + bisherige Gesamtzeit
+            and abs((row[START] - current.row[START]).total_seconds() - current.time)
+            <= 1
+        ):
+            current.time += time_sec
+            current.rounds += 1
+        else:
+            current = _Chain(row, time_sec)
+            chains.append(current)
+    return chains
+
+
+def _top_chains(chains, order_by, limit):
+    if order_by == "start":
+        return _top(chains, lambda c: c.row[START], limit, reverse=True)
+    return _top(chains, lambda c: (-c.rounds, c.time), limit)
+
+
+def _order_chains(chains, order_by, limit):
+    results = []
+    for chain in _top_chains(chains, order_by, limit):
+        group = row_to_dict(chain.row)
+        group["time"] = chain.time
+        group["rounds"] = chain.rounds
+        results.append(group)
+    return results
+
+
+def _top_rows(rows, order_by, limit, to_seconds):
+    if order_by == "start":
+        return _top(rows, itemgetter(START), limit, reverse=True)
+    return _top(rows, lambda r: to_seconds(r[TIME]), limit)
+
+
+def _order_rows(rows, order_by, limit, to_seconds):
+    return [row_to_dict(row) for row in _top_rows(rows, order_by, limit, to_seconds)]
+
+
+def rows_to_columns(rows, to_seconds) -> Dict[str, list]:
+    """Transponiert Zeilen in ROW_FIELDS-Reihenfolge in Ergebnisspalten (km, time in Sekunden)."""
+    if not rows:
+        return {field: [] for field in TRACKING_FIELDS}
+    columns = dict(zip(TRACKING_FIELDS, map(list, zip(*rows))))
+    columns["time"] = [to_seconds(t) for t in columns["time"]]
+    columns["km"] = [metres_to_km(m) for m in columns["km"]]
+    return columns
+
+
+def totals_to_columns(rows) -> Dict[str, list]:
+    """Transponiert (username, Meter, Zeit, Runden)-Zeilen in Ergebnisspalten mit km_total."""
+    if not rows:
+        return {field: [] for field in TOTALS_FIELDS}
+    columns = dict(zip(TOTALS_FIELDS, map(list, zip(*rows))))
+    columns["km_total"] = [metres_to_km(m) for m in columns["km_total"]]
+    return columns
+
+
+def aggregate_rows(
+    rows, group_rounds: str, order_by: str, limit, to_seconds
+) -> List[Dict[str, Any]]:
+    """Gruppiert positionale Zeilen (Tupel/Row) und baut Dicts nur für die ausgegebenen Zeilen."""
+    if group_rounds == "all":
+        return _group_all(rows, limit, to_seconds)
+    if group_rounds == "behind":
+        return _order_chains(_chain_rows(rows, to_seconds), order_by, limit)
+    if group_rounds == "none":
+        return _order_rows(rows, order_by, limit, to_seconds)
+
+
+def aggregate_columns(
+    rows, group_rounds: str, order_by: str, limit, to_seconds
+) -> Dict[str, list]:
+    """Wie aggregate_rows, liefert das Ergebnis aber spaltenweise ohne Dict je Zeile."""
+    if group_rounds == "all":
+        return totals_to_columns(
+            [
+                (username, totals.km_total, totals.time_total, totals.rounds)
+                for username, totals in _top_totals(rows, limit, to_seconds)
+            ]
+        )
+    if group_rounds == "behind":
+        top = _top_chains(_chain_rows(rows, to_seconds), order_by, limit)
+        columns = rows_to_columns([chain.row for chain in top], to_seconds)
+        columns["time"] = [chain.time for chain in top]
+        columns["rounds"] = [chain.rounds for chain in top]
+        return columns
+    if group_rounds == "none":
+        return rows_to_columns(_top_rows(rows, order_by, limit, to_seconds), to_seconds)
+
+
+def aggregate_shapes(
+    rows, shapes, limit, to_seconds
+) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+    """Berechnet mehrere (group_rounds, order_by)-Formen aus denselben Zeilen.
+
+    "all" hängt nicht von order_by ab und wird nur einmal gruppiert; die
+    "behind"-Ketten werden einmal gebildet und je order_by nur neu sortiert.
+    """
+    results = {}
+    grouped_all = None
+    chains = None
+    for group_rounds, order_by in shapes:
+        if group_rounds == "all":
+            if grouped_all is None:
+                grouped_all = _group_all(rows, limit, to_seconds)
+            result = grouped_all
+        elif group_rounds == "behind":
+            if chains is None:
+                chains = _chain_rows(rows, to_seconds)
+            result = _order_chains(chains, order_by, limit)
+        else:
+            result = _order_rows(rows, order_by, limit, to_seconds)
+        results[(group_rounds, order_by)] = result
+    return results
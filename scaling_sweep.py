@@ -0,0 +1,202 @@
+import argparse
+import asyncio
+from collections import defaultdict
+from itertools import combinations
+from statistics import median
+from typing import List, Dict, Any
+
+import numpy as np
+
+from result_store import ResultStore, list_runs, load_results
+from sweep_config import SWEEP_NAME, load_sweep
+
+MODELS = {
+    "linear": lambda n: n,
+    "nlogn": lambda n: n * np.log2(n),
+    "quadratic": lambda n: n**2,
+}
+# Tabelle -> (Größe n, Schlüssel der Variante, weitere Schlüssel einer Kurve)
+CURVE_KEYS = {
+    "read": (
+        "n_trackings",
+        ("db_system", "variant"),
+        ("group_rounds", "order_by", "n_users"),
+    ),
+    "kernel": ("n_rows", ("implementation",), ("group_rounds", "order_by")),
+}
+EXTRAPOLATE = 10
+GRID_POINTS = 400
+
+
+def median_curves(rows, table="read", metric="duration"):
+    """Median der Messwerte je Variante, Kontext und Größe n."""
+    x_key, variant_keys, context_keys = CURVE_KEYS[table]
+    samples = defaultdict(lambda: defaultdict(list))
+    for row in rows:
+        if row.get(metric) is None:
+            continue
+        key = (
+            tuple(row[k] for k in variant_keys),
+            tuple(row[k] for k in context_keys),
+        )
+        samples[key][row[x_key]].append(float(row[metric]))
+    curves = {}
+    for key, by_n in samples.items():
+        n = np.array(sorted(by_n), dtype=np.float64)
+        curves[key] = (n, np.array([median(by_n[x]) for x in sorted(by_n)]))
+    return curves
+
+
+def fit_curve(n, t) -> Dict[str, Any]:
+    """Passt t = a + b * f(n) für linear, n log n und quadratisch an (relativer Fehler) und schätzt den Exponenten."""
+    exponent = None
+    if len(n) >= 2 and (t > 0).all():
+        exponent = float(np.polyfit(np.log(n), np.log(t), 1)[0])
+    fits = {}
+    for name, f in MODELS.items():
+        design = np.column_stack([np.ones_like(n), f(n)]) / t[:, None]
+        coef = np.linalg.lstsq(design, np.ones_like(t), rcond=None)[0]
+        fits[name] = (coef, float(((design @ coef - 1) ** 2).sum()))
+    model = min(fits, key=lambda name: fits[name][1])
+    return {
+        "exponent": exponent,
+        "model": model,
+        "coef": fits[model][0],
+        "error": fits[model][1],
+        "n_max": float(n.max()),
+        "n_min": float(n.min()),
+    }
+
+
+def predict(fit, n):
+    return fit["coef"][0] + fit["coef"][1] * MODELS[fit["model"]](n)
+
+
+def _grid(n_min, n_max):
+    return np.geomspace(max(n_min, 2), n_max * EXTRAPOLATE, GRID_POINTS)
+
+
+def slo_size(fit, slo_seconds):
+    """Kleinstes n, ab dem die angepasste Kurve das SLO überschreitet (None, falls nicht im Raster)."""
+    grid = _grid(fit["n_min"], fit["n_max"])
+    exceeded = np.nonzero(predict(fit, grid) > slo_seconds)[0]
+    return int(grid[exceeded[0]]) if len(exceeded) else None
+
+
+def crossovers(fit_a, fit_b):
+    """Größen, an denen sich die angepassten Kurven zweier Varianten schneiden."""
+    grid = _grid(
+        min(fit_a["n_min"], fit_b["n_min"]), max(fit_a["n_max"], fit_b["n_max"])
+    )
+    diff = predict(fit_a, grid) - predict(fit_b, grid)
+    signs = np.where(diff >= 0, 1, -1)
+    points = []
+    for i in np.nonzero(signs[:-1] != signs[1:])[0]:
+        # log-lineare Interpolation zwischen den Rasterpunkten
+        w = diff[i] / (diff[i] - diff[i + 1])
+        points.append(int(np.exp(np.log(grid[i]) + w * np.log(grid[i + 1] / grid[i]))))
+    return points
+
+
+def analyze(rows, table="read", slo_seconds=None) -> Dict[str, List[Dict[str, Any]]]:
+    fits = {}
+    for key, (n, t) in median_curves(rows, table).items():
+        fits[key] = fit_curve(n, t)
+    curves = []
+    for (variant, context), fit in sorted(fits.items(), key=str):
+        curves.append(
+            {
+                "variant": variant,
+                "context": context,
+                "model": fit["model"],
+                "exponent": fit["exponent"],
+                "slo_n": slo_size(fit, slo_seconds) if slo_seconds else None,
+            }
+        )
+    crossings = []
+    by_context = defaultdict(dict)
+    for (variant, context), fit in fits.items():
+        by_context[context][variant] = fit
+    for context, variants in sorted(by_context.items(), key=str):
+        for a, b in combinations(sorted(variants), 2):
+            for n in crossovers(variants[a], variants[b]):
+                crossings.append({"context": context, "variants": (a, b), "n": n})
+    return {"curves": curves, "crossovers": crossings}
+
+
+def print_report(report, table="read", slo_seconds=None):
+    x_key, _, context_keys = CURVE_KEYS[table]
+    for curve in report["curves"]:
+        context = " ".join(f"{k}={v}" for k, v in zip(context_keys, curve["context"]))
+        exponent = (
+            f"{curve['exponent']:.2f}" if curve["exponent"] is not None else "n/a"
+        )
+        line = f"{'/'.join(curve['variant'])} {context}: Modell={curve['model']} Exponent={exponent}"
+        if slo_seconds:
+            slo_n = curve["slo_n"]
+            line += f" SLO {slo_seconds}s überschritten ab {x_key}={slo_n if slo_n else '-'}"
+        print(line)
+    for crossing in report["crossovers"]:
+        context = " ".join(
+            f"{k}={v}" for k, v in zip(context_keys, crossing["context"])
+        )
+        a, b = ("/".join(v) for v in crossing["variants"])
+        print(f"Crossover {a} <-> {b} {context}: {x_key}≈{crossing['n']}")
+
+
+def run_sweep(sweep, table="read", concurrency=None):
+    """Führt einen Sweep aus und liefert die run_id der gespeicherten Messungen."""
+    if table == "kernel":
+        import kernel_benchmark
+
+        measurements = asyncio.run(
+            kernel_benchmark.run_kernels(
+                sweep["tracking_counts"], n_runs=sweep["n_runs"]
+            )
+        )
+        with ResultStore(
+            kernel_benchmark.RESULT_TABLE_KERNEL, kernel_benchmark.KERNEL_HEADER
+        ) as store:
+            store.extend(measurements)
+        return store.run_id
+    import benchmark_orchestrator
+
+    jobs = benchmark_orchestrator.jobs_for_sweep(sweep)
+    rows = benchmark_orchestrator.run_orchestrated(
+        jobs, concurrency or benchmark_orchestrator.CONCURRENCY
+    )
+    return benchmark_orchestrator.store_results(rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Skalierungs-Sweep mit Kurvenanpassung"
+    )
+    parser.add_argument("--sweep", default=SWEEP_NAME, help="Sweep aus sweeps.toml")
+    parser.add_argument("--table", choices=sorted(CURVE_KEYS), default="read")
+    parser.add_argument(
+        "--run",
+        help="Vorhandenen Lauf auswerten statt neu zu messen ('latest' möglich)",
+    )
+    parser.add_argument("--slo", type=float, help="SLO in Sekunden")
+    parser.add_argument("--concurrency", type=int)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sweep = load_sweep(args.sweep)
+    slo_seconds = args.slo or sweep["slo_seconds"]
+    if args.run == "latest":
+        run_id = list_runs(args.table)[-1]
+    else:
+        run_id = args.run or run_sweep(sweep, args.table, args.concurrency)
+    report = analyze(
+        load_results(args.table, run_ids=[run_id]), args.table, slo_seconds
+    )
+    print(f"Sweep '{sweep['name']}', run_id {run_id}")
+    print_report(report, args.table, slo_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import time
+from datetime import date, datetime
+
+from sqlalchemy_filter import get_tracking_results_python
+from mongo_filter import get_tracking_results_mongodb_python
+from kernel_benchmark import to_mongo_docs
+from parallel_benchmark import generate_rows
+from result_output import dicts_to_json, to_ipc_bytes
+from result_store import ResultStore
+from bench_fixtures import DummySession, DummyMongoDB
+
+N_ROWS = 200000
+RESULT_ROWS = [100, 100000]
+N_RUNS = 5
+SEED = 42
+RESULT_TABLE_SERIALIZATION = "serialization"
+SERIALIZATION_HEADER = [
+    "timestamp",
+    "implementation",
+    "mode",
+    "n_rows",
+    "result_rows",
+    "run",
+    "duration",
+    "n_bytes",
+]
+
+IMPLEMENTATIONS = [
+    ("python", "sql", get_tracking_results_python),
+    ("mongodb_python", "mongo", get_tracking_results_mongodb_python),
+]
+PERIOD = (None, date(2010, 1, 1), date(2025, 12, 31))
+
+
+async def _dicts_json(func, backend, limit):
+    return dicts_to_json(await func(backend, *PERIOD, "start", "none", limit))
+
+
+async def _arrow_ipc(func, backend, limit):
+    batch = await func(backend, *PERIOD, "start", "none", limit, output="arrow")
+    return to_ipc_bytes(batch)
+
+
+async def _columnar_json(func, backend, limit):
+    return await func(backend, *PERIOD, "start", "none", limit, output="json")
+
+
+# Abfrage + Serialisierung bis zu den Bytes, die ausgeliefert würden
+MODES = [
+    ("dicts_json", _dicts_json),
+    ("arrow_ipc", _arrow_ipc),
+    ("columnar_json", _columnar_json),
+]
+
+
+async def run_serialization(
+    n_rows=N_ROWS,
+    result_rows=RESULT_ROWS,
+    implementations=IMPLEMENTATIONS,
+    modes=MODES,
+    n_runs=N_RUNS,
+    seed=SEED,
+):
+    """Misst Abfrage plus Serialisierung je Ausgabeformat ohne Datenbankserver."""
+    rows = generate_rows(n_rows, seed=seed)
+    backends = {"sql": DummySession(rows)}
+    measurements = []
+    for name, kind, func in implementations:
+        if kind == "mongo" and kind not in backends:
+            # to_mongo_docs kopiert; die Zeilen der SQL-Session bleiben unverändert
+            backends[kind] = DummyMongoDB(to_mongo_docs(rows))
+        for limit in result_rows:
+            for mode, serialize in modes:
+                for run in range(1, n_runs + 1):
+                    t1 = time.perf_counter()
+                    payload = await serialize(func, backends[kind], limit)
+                    duration = time.perf_counter() - t1
+                    measurements.append(
+                        [
+                            datetime.now().isoformat(),
+                            name,
+                            mode,
+                            n_rows,
+                            limit,
+                            run,
+                            duration,
+                            len(payload),
+                        ]
+                    )
+                print(
+                    f"{name:>16} {mode:>13} {limit:>7} Ergebniszeilen: "
+                    f"{min(m[6] for m in measurements[-n_runs:]):.4f}s, "
+                    f"{measurements[-1][7]} Bytes"
+                )
+    return measurements
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark Abfrage + Serialisierung der Ergebnisse"
+    )
+    parser.add_argument("--rows", type=int, default=N_ROWS)
+    parser.add_argument("--runs", type=int, default=N_RUNS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    result_rows = [n for n in RESULT_ROWS if n <= args.rows]
+    measurements = asyncio.run(
+        run_serialization(args.rows, result_rows, n_runs=args.runs, seed=args.seed)
+    )
+    with ResultStore(RESULT_TABLE_SERIALIZATION, SERIALIZATION_HEADER) as store:
+        store.extend(measurements)
+    print(f"{len(measurements)} Messungen gespeichert (run_id {store.run_id})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import islice
+from typing import List, Dict, Any
+
+from row_kernels import km_to_metres, metres_to_km
+from sqlalchemy_filter import (
+    get_tracking_results_sqlalchemy,
+    get_tracking_results_python,
+    time_to_seconds,
+)
+from mongo_filter import (
+    get_tracking_results_mongodb,
+    get_tracking_results_mongodb_python,
+)
+
+N_SHARDS = 4
+
+
+def split_period(start_period: date, end_period: date, shards: int = N_SHARDS):
+    """Teilt [start_period, end_period] in bis zu shards lückenlose Tagesbereiche."""
+    days = (end_period - start_period).days + 1
+    shards = max(1, min(shards, days))
+    step, rest = divmod(days, shards)
+    ranges = []
+    current = start_period
+    for i in range(shards):
+        shard_end = current + timedelta(days=step + (1 if i < rest else 0) - 1)
+        ranges.append((current, shard_end))
+        current = shard_end + timedelta(days=1)
+    return ranges
+
+
+def merge_all(partials, limit):
+    # Teilsummen in ganzen Metern addieren, damit die Summe exakt bleibt
+    grouped = defaultdict(
+        lambda: {"username": None, "metres_total": 0, "time_total": 0, "rounds": 0}
+    )
+    for partial in partials:
+        for row in partial:
+            group = grouped[row["username"]]
+            group["username"] = row["username"]
+            group["metres_total"] += km_to_metres(row["km_total"])
+            group["time_total"] += row["time_total"]
+            group["rounds"] += row["rounds"]
+    result_list = list(grouped.values())
+    result_list.sort(key=lambda g: g["metres_total"], reverse=True)
+    return [
+        {
+            "username": group["username"],
+            "km_total": metres_to_km(group["metres_total"]),
+            "time_total": group["time_total"],
+            "rounds": group["rounds"],
+        }
+        for group in result_list[:limit]
+    ]
+
+
+def merge_none(partials, order_by, limit):
+    if order_by == "start":
+        merged = heapq.merge(
+            *partials,
+            key=lambda r: (r["start_date_time"], r["tracking_id"]),
+            reverse=True,
+        )
+    else:
+        merged = heapq.merge(
+            *partials, key=lambda r: (time_to_seconds(r["time"]), r["tracking_id"])
+        )
+    return list(islice(merged, limit))
+
+
+def merge_behind(partials, order_by, limit):
+    """Fügt Rundenketten zusammen, die über Shard-Grenzen hinweg laufen."""
+    groups = sorted(
+        (group for partial in partials for group in partial),
+        key=lambda g: (g["username"], g["start_date_time"]),
+    )
+    results = []
+    current_group = None
+    for group in groups:
+        if current_group and current_group["username"] == group["username"]:
+            group_end = current_group["start_date_time"] + timedelta(
+                seconds=current_group["time"]
+            )
+            time_diff = abs((group_end - group["start_date_time"]).total_seconds())
+            if time_diff <= 1:
+                current_group["time"] += group["time"]
+                current_group["rounds"] += group["rounds"]
+                continue
+        if current_group:
+            results.append(current_group)
+        current_group = dict(group)
+    if current_group:
+        results.append(current_group)
+    if order_by == "start":
+        results.sort(key=lambda g: g["start_date_time"], reverse=True)
+    else:
+        results.sort(key=lambda g: (-g["rounds"], g["time"]))
+    return results[:limit]
+
+
+def merge_partials(
+    partials: List[List[Dict[str, Any]]], group_rounds: str, order_by: str, limit
+):
+    if group_rounds == "all":
+        return merge_all(partials, limit)
+    if group_rounds == "behind":
+        return merge_behind(partials, order_by, limit)
+    return merge_none(partials, order_by, limit)
+
+
+async def get_tracking_results_sharded_sqlalchemy(
+    session_factory,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    order_by: str = "start",
+    group_rounds: str = "none",
+    limit: int = 100,
+    shards: int = N_SHARDS,
+    **filters,
+) -> List[Dict[str, Any]]:
+    """Führt die Abfrage je Zeit-Shard parallel auf eigenen Sessions aus und führt die Teilergebnisse zusammen."""
+
+    async def run_shard(shard_start, shard_end):
+        async with session_factory() as session:
+            if group_rounds == "behind":
+                return await get_tracking_results_python(
+                    session,
+                    gender,
+                    shard_start,
+                    shard_end,
+                    order_by,
+                    group_rounds,
+                    None,
+                    **filters,
+                )
+            return await get_tracking_results_sqlalchemy(
+                session,
+                gender,
+                shard_start,
+                shard_end,
+                order_by,
+                group_rounds,
+                None if group_rounds == "all" else limit,
+                **filters,
+            )
+
+    partials = await asyncio.gather(
+        *(run_shard(s, e) for s, e in split_period(start_period, end_period, shards))
+    )
+    return merge_partials(partials, group_rounds, order_by, limit)
+
+
+async def get_tracking_results_sharded_mongodb(
+    db,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    order_by: str = "start",
+    group_rounds: str = "none",
+    limit: int = 100,
+    shards: int = N_SHARDS,
+    **filters,
+) -> List[Dict[str, Any]]:
+    async def run_shard(shard_start, shard_end):
+        if group_rounds == "behind":
+            return await get_tracking_results_mongodb_python(
+                db,
+                gender,
+                shard_start,
+                shard_end,
+                order_by,
+                group_rounds,
+                None,
+                **filters,
+            )
+        return await get_tracking_results_mongodb(
+            db,
+            gender,
+            shard_start,
+            shard_end,
+            order_by,
+            group_rounds,
+            None if group_rounds == "all" else limit,
+            **filters,
+        )
+
+    partials = await asyncio.gather(
+        *(run_shard(s, e) for s, e in split_period(start_period, end_period, shards))
+    )
+    return merge_partials(partials, group_rounds, order_by, limit)
@@ -0,0 +1,202 @@
+from collections import defaultdict
+from typing import List, Dict, Any
+
+import numpy as np
+from sqlalchemy import select
+
+from models import Tracking, TrackingMeasurement, TrackingPoint, TrackTrackingPoint
+from sqlalchemy_filter import time_to_seconds
+
+MAX_PASSES = 10
+
+
+def _bound_seconds(val, default):
+    if val is None:
+        return default
+    return float(time_to_seconds(val))
+
+
+def build_split_bounds(points: List[Dict[str, Any]]):
+    """Baut Split-Grenzen und Streckenposition je (track_id, Messpunkt) als NumPy-Arrays auf.
+
+    points müssen je Strecke in Streckenreihenfolge (distance) vorliegen, wie
+    load_split_bounds sie liefert; daraus ergibt sich position und
+    track_size (Anzahl Messpunkte der Strecke).
+    """
+    point_index = {}
+    min_split = np.zeros(len(points), dtype=np.float64)
+    max_split = np.full(len(points), np.inf, dtype=np.float64)
+    position = np.zeros(len(points), dtype=np.int64)
+    track_size = np.zeros(len(points), dtype=np.int64)
+    track_points = defaultdict(list)
+    for i, point in enumerate(points):
+        track_id = str(point["track_id"])
+        point_index[(track_id, point["name"])] = i
+        position[i] = len(track_points[track_id])
+        track_points[track_id].append(i)
+        min_split[i] = max(
+            _bound_seconds(point.get("min_split_time"), 0.0),
+            _bound_seconds(point.get("least_time"), 0.0),
+        )
+        upper = _bound_seconds(point.get("max_split_time"), np.inf)
+        max_split[i] = upper if upper > 0 else np.inf
+    for indices in track_points.values():
+        track_size[indices] = len(indices)
+    return point_index, min_split, max_split, position, track_size
+
+
+def _after_first_failure(tr_alive, failed):
+    """Markiert je Tracking die erste fehlerhafte Messung und alle späteren."""
+    first = np.ones(len(tr_alive), dtype=bool)
+    first[1:] = tr_alive[1:] != tr_alive[:-1]
+    group = np.cumsum(first) - 1
+    count = np.cumsum(failed)
+    before_group = (count - failed)[first]
+    return count - before_group[group] > 0
+
+
+def validate_splits(
+    tracking_codes: np.ndarray,
+    point_codes: np.ndarray,
+    timestamps: np.ndarray,
+    min_split: np.ndarray,
+    max_split: np.ndarray,
+    position: np.ndarray,
+    track_size: np.ndarray,
+) -> np.ndarray:
+    """Prüft die Splits aufeinanderfolgender Messpunkte je Tracking.
+
+    Jede Messung muss am nächsten Punkt der Strecke nach der vorherigen
+    gültigen Messung liegen (nach dem letzten Punkt folgt wieder der erste),
+    und ihr Split muss in den Grenzen dieses Punkts liegen. Gibt eine Maske in
+    Eingabereihenfolge zurück (True = plausibel). Messungen mit unplausiblem
+    Split (z.B. Doppellesungen) werden entfernt und die übrigen erneut
+    geprüft; ein übersprungener oder vertauschter Punkt verwirft die Messung
+    und alle folgenden des Trackings, da deren Splits nicht mehr zuzuordnen sind.
+    """
+    n = len(timestamps)
+    valid = point_codes >= 0
+    if n == 0:
+        return valid
+    order = np.lexsort((timestamps, tracking_codes))
+    tr = tracking_codes[order]
+    pc = np.where(point_codes[order] >= 0, point_codes[order], 0)
+    ts = timestamps[order]
+    lower = min_split[pc]
+    upper = max_split[pc]
+    pos = position[pc]
+    expected_after = (pos + 1) % np.maximum(track_size[pc], 1)
+    alive = valid[order]
+    for _ in range(MAX_PASSES):
+        idx = np.flatnonzero(alive)
+        if len(idx) < 2:
+            break
+        first = np.ones(len(idx), dtype=bool)
+        first[1:] = tr[idx[1:]] != tr[idx[:-1]]
+        split = np.zeros(len(idx), dtype=np.float64)
+        split[1:] = ts[idx[1:]] - ts[idx[:-1]]
+        split_ok = first | ((split >= lower[idx]) & (split <= upper[idx]))
+        if not split_ok.all():
+            alive[idx[~split_ok]] = False
+            continue
+        in_sequence = np.ones(len(idx), dtype=bool)
+        in_sequence[1:] = pos[idx[1:]] == expected_after[idx[:-1]]
+        in_sequence |= first
+        if in_sequence.all():
+            break
+        alive[idx[_after_first_failure(tr[idx], ~in_sequence)]] = False
+    valid[order] = alive
+    return valid
+
+
+async def load_event_measurements(session, event_id) -> List[Dict[str, Any]]:
+    stmt = (
+        select(
+            TrackingMeasurement.id,
+            TrackingMeasurement.tracking_id,
+            TrackingMeasurement.timestamp,
+            TrackingMeasurement.distanz,
+            TrackingMeasurement.name,
+            Tracking.track_id,
+        )
+        .join(Tracking, TrackingMeasurement.tracking_id == Tracking.tracking_id)
+        .where(Tracking.event_id == event_id)
+    )
+    result = await session.execute(stmt)
+    return [dict(row._mapping) for row in result.fetchall()]
+
+
+async def load_split_bounds(session, track_ids) -> List[Dict[str, Any]]:
+    stmt = (
+        select(
+            TrackTrackingPoint.track_id,
+            TrackingPoint.name,
+            TrackingPoint.distance,
+            TrackingPoint.min_split_time,
+            TrackingPoint.max_split_time,
+            TrackingPoint.least_time,
+        )
+        .join(
+            TrackingPoint,
+            TrackTrackingPoint.tracking_point_id == TrackingPoint.tracking_point_id,
+        )
+        .where(TrackTrackingPoint.track_id.in_(track_ids))
+        .where(TrackingPoint.activ.is_(True))
+        .order_by(TrackTrackingPoint.track_id, TrackingPoint.distance)
+    )
+    result = await session.execute(stmt)
+    return [dict(row._mapping) for row in result.fetchall()]
+
+
+def validate_measurements(
+    measurements: List[Dict[str, Any]], points: List[Dict[str, Any]], drop: bool = True
+) -> Dict[Any, List[Dict[str, Any]]]:
+    """Validiert Messungen gegen die Split-Grenzen und gruppiert sie je Tracking für den Rundenaufbau."""
+    point_index, min_split, max_split, position, track_size = build_split_bounds(points)
+    tracking_ids = {}
+    tracking_codes = np.fromiter(
+        (
+            tracking_ids.setdefault(m["tracking_id"], len(tracking_ids))
+            for m in measurements
+        ),
+        dtype=np.int64,
+        count=len(measurements),
+    )
+    point_codes = np.fromiter(
+        (point_index.get((str(m["track_id"]), m["name"]), -1) for m in measurements),
+        dtype=np.int64,
+        count=len(measurements),
+    )
+    timestamps = np.fromiter(
+        (m["timestamp"].timestamp() for m in measurements),
+        dtype=np.float64,
+        count=len(measurements),
+    )
+    valid = validate_splits(
+        tracking_codes,
+        point_codes,
+        timestamps,
+        min_split,
+        max_split,
+        position,
+        track_size,
+    )
+    laps = defaultdict(list)
+    for measurement, ok in zip(measurements, valid.tolist()):
+        if drop and not ok:
+            continue
+        if not drop:
+            measurement = {**measurement, "valid": ok}
+        laps[measurement["tracking_id"]].append(measurement)
+    for rows in laps.values():
+        rows.sort(key=lambda m: m["timestamp"])
+    return dict(laps)
+
+
+async def validate_event_measurements(session, event_id, drop: bool = True):
+    measurements = await load_event_measurements(session, event_id)
+    if not measurements:
+        return {}
+    track_ids = list({m["track_id"] for m in measurements})
+    points = await load_split_bounds(session, track_ids)
+    return validate_measurements(measurements, points, drop=drop)
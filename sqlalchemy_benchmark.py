@@ -1,15 +1,24 @@
+import json
 import time
+import uuid
 from mongo.sqlalchemy_filter import (
     get_tracking_results_sqlalchemy,
     get_tracking_results_python,
+    build_params,
+    build_statement,
+    prewarm_statements,
 )
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-from sqlalchemy import update
-from common.models import User
-from datetime import time as dt_time, timedelta
+from sqlalchemy import text, update
+from sqlalchemy.dialects import mysql
+from common.database import SessionLocal, create_tables
+from common.models import User, Tracking
+from dual_loader import load_sql
+from memory_profile import MEMORY_PROFILE, TOP_ALLOCATIONS, measure_memory
+from datetime import time as dt_time, timedelta, date, datetime
 
 
 def to_seconds(val):
@@ -61,26 +70,35 @@ async def benchmark_functions(
     order_by,
     limit,
     variant="sql",
+    memory=MEMORY_PROFILE,
+    top_allocations=TOP_ALLOCATIONS,
 ):
-    t1 = time.perf_counter()
     if variant == "sql":
-        res = await get_tracking_results_sqlalchemy(
-            session, gender, start_period, end_period, order_by, group_rounds, limit
-        )
+        query = get_tracking_results_sqlalchemy
     else:
-        res = await get_tracking_results_python(
+        query = get_tracking_results_python
+
+    def call():
+        return query(
             session, gender, start_period, end_period, order_by, group_rounds, limit
         )
+
+    t1 = time.perf_counter()
+    res = await call()
     t2 = time.perf_counter()
 
     duration = t2 - t1
     result_count = len(res)
-    return {
+    result = {
         "variant": variant,
         "duration": duration,
         "result_count": result_count,
         "equal": None,
     }
+    if memory:
+        # eigener Durchlauf, damit tracemalloc die Zeitmessung nicht verfälscht
+        result.update(await measure_memory(call, top_allocations))
+    return result
 
 
 async def benchmark_update_username_sqlalchemy(session, user_id, new_username):
@@ -101,3 +119,218 @@ async def benchmark_update_gender_sqlalchemy(session, user_id, new_gender):
     await session.commit()
     t2 = time.perf_counter()
     return t2 - t1
+
+
+def benchmark_statement_overhead(n_calls=10000, gender="male"):
+    """Python-Overhead je Aufruf ohne und mit Statement-Cache (Aufbau, Cache-Key, Kompilierung)."""
+    dialect = mysql.dialect()
+    compiled_cache = {}
+    results = {}
+    for label, build in [
+        ("uncached", build_statement.__wrapped__),
+        ("cached", build_statement),
+    ]:
+        t1 = time.perf_counter()
+        for _ in range(n_calls):
+            params = build_params(gender, date(2025, 6, 1), date(2025, 6, 2))
+            params["limit"] = 100
+            stmt = build("rows", "start", frozenset(params))
+            key = stmt._generate_cache_key().key
+            if key not in compiled_cache:
+                compiled_cache[key] = stmt.compile(dialect=dialect)
+            compiled_cache[key].construct_params(params)
+        t2 = time.perf_counter()
+        results[label] = (t2 - t1) / n_calls
+    return results
+
+
+# Indizes, die mit der Umstellung auf halboffene Zeitstempelbereiche eingeführt wurden
+PLAN_INDEXES = ("ix_tracking_start_cover", "ix_tracking_user_start")
+
+
+def summarize_plan(plan):
+    """Zieht je Tabelle Zugriffsart, Index, geschätzte Zeilen, Covering und Filesort aus EXPLAIN FORMAT=JSON."""
+    tables = []
+
+    def walk(node, filesort=False):
+        if isinstance(node, dict):
+            # ordering_operation mit using_filesort umschließt die sortierten Tabellen
+            filesort = filesort or bool(node.get("using_filesort", False))
+            if "table_name" in node and "access_type" in node:
+                tables.append(
+                    {
+                        "table": node["table_name"],
+                        "access_type": node["access_type"],
+                        "key": node.get("key"),
+                        "rows_examined": node.get("rows_examined_per_scan"),
+                        "covering": bool(node.get("using_index", False)),
+                        "filesort": filesort,
+                    }
+                )
+            for value in node.values():
+                walk(value, filesort)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, filesort)
+
+    walk(plan)
+    return tables
+
+
+async def explain_tracking_query(
+    session,
+    gender,
+    group_rounds,
+    order_by,
+    limit,
+    start_period=date(2010, 1, 1),
+    end_period=date(2025, 12, 31),
+    sargable=True,
+    ignore_indexes=(),
+    cursor=False,
+):
+    params = build_params(gender, start_period, end_period)
+    if cursor:
+        # Folgeseite mitten im Bereich; die Werte beeinflussen nur die Zeilenschätzung
+        params["cursor_id"] = uuid.UUID(int=0)
+        if order_by == "start":
+            params["cursor_key"] = datetime.combine(end_period, dt_time.min)
+        else:
+            params["cursor_key"] = dt_time(minute=20)
+    if not sargable:
+        del params["start_at"], params["end_before"]
+        params["start_period"] = start_period
+        params["end_period"] = end_period
+    if limit is not None:
+        params["limit"] = limit
+    if group_rounds == "all":
+        kind, order_by = "all", None
+    else:
+        kind = "rows"
+    stmt = build_statement(kind, order_by, frozenset(params), sargable=sargable)
+    stmt = stmt.params(**params)
+    if ignore_indexes:
+        stmt = stmt.with_hint(
+            Tracking, f"IGNORE INDEX ({', '.join(ignore_indexes)})", "mysql"
+        )
+    conn = await session.connection()
+    sql = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    result = await conn.exec_driver_sql(f"EXPLAIN FORMAT=JSON {sql}")
+    return summarize_plan(json.loads(result.scalar()))
+
+
+async def compare_index_plans(session, gender, group_rounds, order_by, limit):
+    """Ausführungspläne vor (DATE()-Prädikat, ohne neue Indizes) und nach der Umstellung.
+
+    Für Einzelrunden kommt der Plan einer Cursor-Folgeseite hinzu; dieser muss
+    in Indexreihenfolge lesen, sonst kostet jede tiefe Seite einen Filesort.
+    """
+    plans = {
+        "before": await explain_tracking_query(
+            session,
+            gender,
+            group_rounds,
+            order_by,
+            limit,
+            sargable=False,
+            ignore_indexes=PLAN_INDEXES,
+        ),
+        "after": await explain_tracking_query(
+            session, gender, group_rounds, order_by, limit
+        ),
+    }
+    if group_rounds != "all":
+        plans["cursor"] = await explain_tracking_query(
+            session, gender, group_rounds, order_by, limit, cursor=True
+        )
+        sorted_tables = [t["table"] for t in plans["cursor"] if t["filesort"]]
+        if sorted_tables:
+            print(
+                f"WARNUNG: Cursor-Seite ({order_by}) sortiert per Filesort: {', '.join(sorted_tables)}"
+            )
+    return plans
+
+
+# Backend-Schnittstelle für main.run_benchmark_cell, siehe backends.register
+
+DB_SYSTEM = "SQLAlchemy"
+READ_VARIANTS = [
+    ("sql", "SQLAlchemy-Benchmark (DB-Filtern)"),
+    ("python", "SQLAlchemy-Benchmark (Python-Filtern)"),
+]
+
+
+def _session_factory(resources):
+    return resources.get("session_factory") or SessionLocal
+
+
+async def prepare(resources):
+    await (resources.get("setup_tables") or create_tables)()
+    async with _session_factory(resources)() as session:
+        await prewarm_statements(session)
+    overhead = benchmark_statement_overhead()
+    print(
+        f"Statement-Overhead je Aufruf: ohne Cache {overhead['uncached'] * 1e6:.1f} µs, "
+        f"mit Cache {overhead['cached'] * 1e6:.1f} µs"
+    )
+
+
+async def clear(resources):
+    async with _session_factory(resources)() as session:
+        for table in ["tracking", "event", "track", "users"]:
+            await session.execute(text(f"DELETE FROM {table}"))
+        await session.commit()
+    print("Alle SQLAlchemy-Tabellen geleert.")
+
+
+async def load(resources, data):
+    await (resources.get("setup_tables") or create_tables)()
+    return await load_sql(_session_factory(resources), *data)
+
+
+async def explain_plans(resources, cell):
+    async with _session_factory(resources)() as session:
+        return await compare_index_plans(
+            session,
+            cell["gender"],
+            cell["group_rounds"],
+            cell["order_by"],
+            cell["limit"],
+        )
+
+
+async def read_benchmarks(resources, cell, data):
+    results = []
+    for variant, label in READ_VARIANTS:
+        print(f"\n--- Starte {label} ---")
+        async with _session_factory(resources)() as session:
+            results.append(
+                await benchmark_functions(
+                    session=session,
+                    gender=cell["gender"],
+                    start_period=date(2010, 1, 1),
+                    end_period=date(2025, 12, 31),
+                    group_rounds=cell["group_rounds"],
+                    order_by=cell["order_by"],
+                    limit=cell["limit"],
+                    variant=variant,
+                )
+            )
+    return results
+
+
+async def update_benchmarks(resources, user_id, changes):
+    session_factory = _session_factory(resources)
+    results = []
+    for update_run, username, gender in changes:
+        async with session_factory() as session:
+            duration = await benchmark_update_username_sqlalchemy(
+                session, user_id, username
+            )
+        results.append((update_run, "update_username", duration, None))
+        async with session_factory() as session:
+            duration = await benchmark_update_gender_sqlalchemy(
+                session, user_id, gender
+            )
+        results.append((update_run, "update_gender", duration, None))
+    return results
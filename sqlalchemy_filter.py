@@ -1,18 +1,44 @@
-from datetime import date, timedelta
-from typing import List, Dict, Any
-from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Tuple
 from datetime import time as dt_time
+from functools import lru_cache
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import (
+    select,
+    func,
+    and_,
+    exists,
+    tuple_,
+    bindparam,
+    cast,
+    Date,
+    DateTime,
+    Integer,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 from dotenv import load_dotenv
 
-from models import Tracking, User, Event, Track
+from models import Tracking, User, Event, Track, EventParticipant
+from pagination import decode_cursor, seconds_to_time
+from result_output import render
+from row_kernels import (
+    METRES_PER_KM,
+    aggregate_columns,
+    aggregate_rows,
+    aggregate_shapes,
+    metres_to_km,
+    row_to_dict,
+    rows_to_columns,
+    totals_to_columns,
+)
 
 load_dotenv(override=True)
 
+# DECIMAL(10, 2) km als ganze Meter, damit weder DB noch Python mit Decimal summieren
+TRACK_METRES = cast(Track.distanz * METRES_PER_KM, Integer)
+
 
 def time_to_seconds(val):
     if isinstance(val, timedelta):
@@ -27,27 +53,107 @@ def time_to_seconds(val):
     return 0
 
 
-async def get_tracking_results_sqlalchemy(
-    session: AsyncSession,
+def period_bounds(start_period: date, end_period: date) -> Dict[str, datetime]:
+    """Halboffener Zeitstempelbereich [start_at, end_before) für die Tage start_period bis end_period."""
+    start_at = datetime.combine(start_period, dt_time.min)
+    if end_period == date.max:
+        end_before = datetime.max
+    else:
+        end_before = datetime.combine(end_period + timedelta(days=1), dt_time.min)
+    return {"start_at": start_at, "end_before": end_before}
+
+
+def build_params(
     gender: str,
     start_period: date,
     end_period: date,
-    order_by: str = "start",
-    group_rounds: str = "none",
-    limit: int = 100,
-) -> List[Dict[str, Any]]:
-    """Aggregiert Tracking-Ergebnisse nach verschiedenen Gruppierungsmodi."""
-    conditions = [
-        func.date(Tracking.start_date_time) >= start_period,
-        func.date(Tracking.start_date_time) <= end_period,
-    ]
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+) -> Dict[str, Any]:
+    if participants_only and not event_id:
+        raise ValueError("participants_only erfordert eine event_id")
+    params = period_bounds(start_period, end_period)
     if gender:
-        conditions.append(User.gender == gender)
-    if group_rounds == "all":
+        params["gender"] = gender
+    if event_id:
+        params["event_id"] = event_id
+    if club_id:
+        params["club_id"] = club_id
+    return params
+
+
+def build_statement(
+    kind: str,
+    order_by: str,
+    filters: frozenset,
+    participants_only: bool = False,
+    sargable: bool = True,
+):
+    """Baut das Statement je Abfrageform (kind, order_by, gesetzte Filter) einmalig mit gebundenen Parametern.
+
+    sargable=False erzeugt die frühere Form mit DATE() um die Spalte (Parameter
+    start_period/end_period), um Ausführungspläne vergleichen zu können.
+    """
+    # lru_cache trennt positionale, benannte und weggelassene Argumente; daher
+    # immer vollständig positional aufrufen, damit prewarm_statements trifft
+    return _build_statement(
+        kind, order_by, filters, bool(participants_only), bool(sargable)
+    )
+
+
+@lru_cache(maxsize=None)
+def _build_statement(
+    kind: str,
+    order_by: str,
+    filters: frozenset,
+    participants_only: bool = False,
+    sargable: bool = True,
+):
+    if sargable:
+        conditions = [
+            Tracking.start_date_time >= bindparam("start_at", type_=DateTime),
+            Tracking.start_date_time < bindparam("end_before", type_=DateTime),
+        ]
+    else:
+        conditions = [
+            func.date(Tracking.start_date_time)
+            >= bindparam("start_period", type_=Date),
+            func.date(Tracking.start_date_time) <= bindparam("end_period", type_=Date),
+        ]
+    if "gender" in filters:
+        conditions.append(User.gender == bindparam("gender"))
+    if "event_id" in filters:
+        conditions.append(Tracking.event_id == bindparam("event_id"))
+    if "club_id" in filters:
+        conditions.append(User.club_id == bindparam("club_id"))
+    if participants_only:
+        conditions.append(
+            exists().where(
+                EventParticipant.event_id == bindparam("event_id"),
+                EventParticipant.user_id == Tracking.user_id,
+            )
+        )
+    if "cursor_key" in filters:
+        cursor_id = bindparam("cursor_id", type_=Tracking.tracking_id.type)
+        if order_by == "start":
+            conditions.append(
+                tuple_(Tracking.start_date_time, Tracking.tracking_id)
+                < tuple_(
+                    bindparam("cursor_key", type_=Tracking.start_date_time.type),
+                    cursor_id,
+                )
+            )
+        else:
+            conditions.append(
+                tuple_(Tracking.time, Tracking.tracking_id)
+                > tuple_(bindparam("cursor_key", type_=Tracking.time.type), cursor_id)
+            )
+    if kind == "all":
         stmt = (
             select(
                 User.username,
-                func.sum(Track.distanz).label("km_total"),
+                cast(func.sum(TRACK_METRES), Integer).label("metres_total"),
                 func.sum(func.time_to_sec(Tracking.time)).label("time_total"),
                 func.count(Tracking.tracking_id).label("rounds"),
             )
@@ -55,33 +161,140 @@ async def get_tracking_results_sqlalchemy(
             .join(Track, Tracking.track_id == Track.track_id)
             .where(and_(*conditions))
             .group_by(User.username)
-            .order_by(func.sum(Track.distanz).desc())
-            .limit(limit)
+            .order_by(func.sum(TRACK_METRES).desc())
         )
-        result = await session.execute(stmt)
-        return [dict(row._mapping) for row in result.fetchall()]
-    order_clause = (
-        Tracking.start_date_time.desc() if order_by == "start" else Tracking.time.asc()
-    )
-    stmt = (
-        select(
-            Tracking.tracking_id,
-            Tracking.start_date_time,
-            func.time_to_sec(Tracking.time).label("time"),
-            Track.distanz.label("km"),
-            Event.name.label("event_name"),
-            User.username,
+    elif kind == "rows":
+        if order_by == "start":
+            order_clause = (
+                Tracking.start_date_time.desc(),
+                Tracking.tracking_id.desc(),
+            )
+        else:
+            order_clause = (Tracking.time.asc(), Tracking.tracking_id.asc())
+        stmt = (
+            select(
+                Tracking.tracking_id,
+                Tracking.start_date_time,
+                func.time_to_sec(Tracking.time).label("time"),
+                TRACK_METRES.label("metres"),
+                Event.name.label("event_name"),
+                User.username,
+            )
+            .join(User, Tracking.user_id == User.user_id)
+            .outerjoin(Event, Tracking.event_id == Event.event_id)
+            .join(Track, Tracking.track_id == Track.track_id)
+            .where(and_(*conditions))
+            .order_by(*order_clause)
         )
-        .join(User, Tracking.user_id == User.user_id)
-        .outerjoin(Event, Tracking.event_id == Event.event_id)
-        .join(Track, Tracking.track_id == Track.track_id)
-        .where(and_(*conditions))
-        .order_by(order_clause)
-        .limit(limit)
+    else:
+        stmt = (
+            select(
+                Tracking.tracking_id,
+                Tracking.start_date_time,
+                Tracking.time,
+                TRACK_METRES.label("metres"),
+                Event.name.label("event_name"),
+                User.username,
+            )
+            .join(User, Tracking.user_id == User.user_id)
+            .outerjoin(Event, Tracking.event_id == Event.event_id)
+            .join(Track, Tracking.track_id == Track.track_id)
+            .where(and_(*conditions))
+        )
+    if "limit" in filters:
+        stmt = stmt.limit(bindparam("limit", type_=Integer))
+    return stmt
+
+
+# Schnittstelle wie bei lru_cache (Cache-Statistik, ungecachter Aufbau)
+build_statement.cache_info = _build_statement.cache_info
+build_statement.cache_clear = _build_statement.cache_clear
+build_statement.__wrapped__ = _build_statement.__wrapped__
+
+
+def _group_all_result(row):
+    return {
+        "username": row["username"],
+        "km_total": metres_to_km(row["metres_total"]),
+        "time_total": row["time_total"],
+        "rounds": row["rounds"],
+    }
+
+
+async def prewarm_statements(session: AsyncSession):
+    """Baut die häufigen Abfrageformen vorab und lässt sie einmal kompilieren (leerer Zeitraum)."""
+    shapes = [("all", None), ("rows", "start"), ("rows", "best"), ("python", None)]
+    for kind, order_by in shapes:
+        for gender in ("male", None):
+            params = build_params(gender, date.max, date.min)
+            if kind != "python":
+                params["limit"] = 0
+            stmt = build_statement(kind, order_by, frozenset(params))
+            await session.execute(stmt, params)
+
+
+async def get_tracking_results_sqlalchemy(
+    session: AsyncSession,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    order_by: str = "start",
+    group_rounds: str = "none",
+    limit: int = 100,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+    cursor: str = None,
+    output: str = "dicts",
+) -> List[Dict[str, Any]]:
+    """Aggregiert Tracking-Ergebnisse nach verschiedenen Gruppierungsmodi.
+
+    Für Einzelrunden kann mit cursor (siehe pagination.next_cursor) seitenweise
+    gelesen werden. output="arrow"/"json" liefert einen RecordBatch bzw.
+    orjson-Bytes (siehe result_output.render).
+    """
+    if cursor and group_rounds == "all":
+        raise ValueError("cursor wird für group_rounds='all' nicht unterstützt")
+    params = build_params(
+        gender, start_period, end_period, event_id, club_id, participants_only
     )
-    result = await session.execute(stmt)
+    if limit is not None:
+        params["limit"] = limit
+    if group_rounds == "all":
+        kind, order_by = "all", None
+    else:
+        kind = "rows"
+        if cursor:
+            key, params["cursor_id"] = decode_cursor(cursor, order_by)
+            params["cursor_key"] = key if order_by == "start" else seconds_to_time(key)
+    stmt = build_statement(kind, order_by, frozenset(params), participants_only)
+    result = await session.execute(stmt, params)
     rows = result.fetchall()
-    return [dict(row._mapping) for row in rows]
+    if output != "dicts":
+        if kind == "all":
+            return render(totals_to_columns(rows), output)
+        return render(rows_to_columns(rows, time_to_seconds), output)
+    if kind == "all":
+        return [_group_all_result(row._mapping) for row in rows]
+    return [row_to_dict(row) for row in rows]
+
+
+async def fetch_tracking_rows(
+    session: AsyncSession,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+):
+    """Lädt die ungruppierten Tracking-Zeilen für die Python-Aggregation."""
+    params = build_params(
+        gender, start_period, end_period, event_id, club_id, participants_only
+    )
+    stmt = build_statement("python", None, frozenset(params), participants_only)
+    result = await session.execute(stmt, params)
+    return result.fetchall()
 
 
 async def get_tracking_results_python(
@@ -92,85 +305,50 @@ async def get_tracking_results_python(
     order_by: str = "start",
     group_rounds: str = "none",
     limit: int = 100,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+    output: str = "dicts",
 ) -> List[Dict[str, Any]]:
     """Aggregiert Tracking-Ergebnisse in Python nach verschiedenen Gruppierungsmodi."""
-    conditions = [
-        func.date(Tracking.start_date_time) >= start_period,
-        func.date(Tracking.start_date_time) <= end_period,
-    ]
-    if gender:
-        conditions.append(User.gender == gender)
-
-    stmt = (
-        select(
-            Tracking.tracking_id,
-            Tracking.start_date_time,
-            Tracking.time,
-            Track.distanz.label("km"),
-            Event.name.label("event_name"),
-            User.username,
-        )
-        .join(User, Tracking.user_id == User.user_id)
-        .outerjoin(Event, Tracking.event_id == Event.event_id)
-        .join(Track, Tracking.track_id == Track.track_id)
-        .where(and_(*conditions))
+    rows = await fetch_tracking_rows(
+        session,
+        gender,
+        start_period,
+        end_period,
+        event_id,
+        club_id,
+        participants_only,
     )
-
-    result = await session.execute(stmt)
-    rows = [dict(row._mapping) for row in result.fetchall()]
-
+    if output != "dicts":
+        columns = aggregate_columns(
+            rows, group_rounds, order_by, limit, time_to_seconds
+        )
+        return render(columns, output)
     if not rows:
         return []
-    if group_rounds == "all":
-        grouped = defaultdict(
-            lambda: {"username": None, "km_total": 0, "time_total": 0, "rounds": 0}
-        )
-        for row in rows:
-            username = row["username"]
-            time_sec = time_to_seconds(row["time"])
-            if grouped[username]["username"] is None:
-                grouped[username]["username"] = username
-            grouped[username]["km_total"] += row["km"]
-            grouped[username]["time_total"] += time_sec
-            grouped[username]["rounds"] += 1
-        result_list = list(grouped.values())
-        result_list.sort(key=lambda g: g["km_total"], reverse=True)
-        return result_list[:limit]
-    if group_rounds == "behind":
-        rows.sort(key=lambda r: (r["username"], r["start_date_time"]))
-        results = []
-        current_group = None
-        for row in rows:
-            time_sec = time_to_seconds(row["time"])
-            if (not current_group) or (current_group["username"] != row["username"]):
-                if current_group:
-                    results.append(current_group)
-                current_group = row.copy()
-                current_group["time"] = time_sec
-                current_group["rounds"] = 1
-            else:
-                group_end = current_group["start_date_time"] + timedelta(
-                    seconds=current_group["time"]
-                )
-                time_diff = abs((group_end - row["start_date_time"]).total_seconds())
-                if time_diff <= 1:
-                    current_group["time"] += time_sec
-                    current_group["rounds"] += 1
-                else:
-                    results.append(current_group)
-                    current_group = row.copy()
-                    current_group["time"] = time_sec
-                    current_group["rounds"] = 1
-        if current_group:
-            results.append(current_group)
-        if order_by == "start":
-            results.sort(key=lambda g: g["start_date_time"], reverse=True)
-        else:
-            results.sort(key=lambda g: (-g["rounds"], g["time"]))
-        return results[:limit]
-    if group_rounds == "none":
-        if order_by == "start":
-            rows.sort(key=lambda r: r["start_date_time"], reverse=True)
-        else:
-            rows.sort(key=lambda r: time_to_seconds(r["time"]))
-        return rows[:limit]
+    return aggregate_rows(rows, group_rounds, order_by, limit, time_to_seconds)
+
+
+async def get_tracking_results_python_batch(
+    session: AsyncSession,
+    gender: str,
+    start_period: date,
+    end_period: date,
+    shapes: List[Tuple[str, str]],
+    limit: int = 100,
+    event_id=None,
+    club_id=None,
+    participants_only: bool = False,
+) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+    """Wertet mehrere (group_rounds, order_by)-Formen mit gemeinsamem Filter über einen einzigen Fetch aus."""
+    rows = await fetch_tracking_rows(
+        session,
+        gender,
+        start_period,
+        end_period,
+        event_id,
+        club_id,
+        participants_only,
+    )
+    return aggregate_shapes(rows, shapes, limit, time_to_seconds)
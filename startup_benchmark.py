@@ -0,0 +1,98 @@
+import argparse
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from backends import BACKENDS
+from result_store import ResultStore
+
+N_RUNS = 5
+TOP_MODULES = 5
+RESULT_TABLE_STARTUP = "startup"
+STARTUP_HEADER = [
+    "timestamp",
+    "backends",
+    "run",
+    "import_us",
+    "n_modules",
+    "top_modules",
+]
+
+# Start wie ein Worker: main importieren und die gewählten Backends laden
+STARTUP_CODE = (
+    "import main, backends\n"
+    "for name in main.BACKENDS:\n"
+    "    backends.get_backend(name)\n"
+)
+
+
+def parse_importtime(stderr: str):
+    """Liefert (Gesamtzeit in µs, Anzahl Module, [(kumuliert µs, Modul)] der obersten Ebene)."""
+    top_level = []
+    n_modules = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        n_modules += 1
+        # Module der obersten Ebene sind nur durch ein Leerzeichen eingerückt
+        if not name.startswith("  "):
+            top_level.append((int(cumulative), name.strip()))
+    return sum(us for us, _ in top_level), n_modules, sorted(top_level, reverse=True)
+
+
+def measure_startup(backends: str):
+    env = {**os.environ, "BENCH_BACKENDS": backends}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def run_startup(variants, n_runs=N_RUNS):
+    measurements = []
+    for backends in variants:
+        for run in range(1, n_runs + 1):
+            import_us, n_modules, top = measure_startup(backends)
+            measurements.append(
+                [
+                    datetime.now().isoformat(),
+                    backends or "alle",
+                    run,
+                    import_us,
+                    n_modules,
+                    ", ".join(
+                        f"{name}={us / 1000:.0f}ms" for us, name in top[:TOP_MODULES]
+                    ),
+                ]
+            )
+        best = min(measurements[-n_runs:], key=lambda m: m[3])
+        print(f"{best[1]:>12}: {best[3] / 1000:7.1f} ms, {best[4]} Module ({best[5]})")
+    return measurements
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Importzeit (python -X importtime) je Backend-Auswahl"
+    )
+    parser.add_argument("--runs", type=int, default=N_RUNS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # "" = alle registrierten Backends, wie ohne BENCH_BACKENDS
+    variants = list(BACKENDS) + [""]
+    measurements = run_startup(variants, args.runs)
+    with ResultStore(RESULT_TABLE_STARTUP, STARTUP_HEADER) as store:
+        store.extend(measurements)
+    print(f"{len(measurements)} Messungen gespeichert (run_id {store.run_id})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import os
+import tomllib
+from typing import List, Dict, Any
+
+SWEEP_CONFIG = os.getenv(
+    "BENCH_SWEEP_CONFIG", os.path.join(os.path.dirname(__file__), "sweeps.toml")
+)
+SWEEP_NAME = os.getenv("BENCH_SWEEP", "default")
+
+
+def geometric_range(start: int, stop: int, factor: float) -> List[int]:
+    """Geometrische Folge start, start * factor, ... bis einschließlich stop."""
+    if start <= 0 or factor <= 1:
+        raise ValueError("start muss positiv und factor größer als 1 sein")
+    values = []
+    k = 0
+    while True:
+        value = round(start * factor**k)
+        if value >= stop * 0.999:
+            values.append(stop)
+            return values
+        values.append(value)
+        k += 1
+
+
+def _expand(spec) -> List[int]:
+    if isinstance(spec, list):
+        return spec
+    if "values" in spec:
+        return spec["values"]
+    return geometric_range(spec["start"], spec["stop"], spec["factor"])
+
+
+def load_sweep(name: str = SWEEP_NAME, path: str = SWEEP_CONFIG) -> Dict[str, Any]:
+    """Liest einen benannten Sweep aus der TOML-Konfiguration."""
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+    if name not in config:
+        raise ValueError(f"Sweep '{name}' nicht in {path} definiert")
+    sweep = config[name]
+    return {
+        "name": name,
+        "n_runs": sweep.get("n_runs", 1),
+        "slo_seconds": sweep.get("slo_seconds"),
+        "benchmarks": [tuple(b) for b in sweep["benchmarks"]],
+        "user_counts": _expand(sweep["users"]),
+        "tracking_counts": _expand(sweep["trackings"]),
+        # Name oder Tabelle mit name und überschriebenen Parametern, siehe create_random_data.PROFILES
+        "profile": sweep.get("profile"),
+    }
@@ -1,3 +1,4 @@
+import json
 import pytest
 from datetime import datetime, date, timedelta
 from collections import defaultdict
@@ -10,66 +11,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import sqlalchemy_filter as sa_filter
 import mongo_filter as mongo_filter
-
-
-class DummySession:
-    def __init__(self, rows):
-        self._rows = rows
-
-    async def execute(self, stmt):
-        class Result:
-            def fetchall(self_inner):
-                return [SimpleNamespace(_mapping=row) for row in self._rows]
-
-        return Result()
-
-
-class DummyCursor:
-    def __init__(self, docs):
-        self.docs = docs
-
-    def sort(self, *args, **kwargs):
-        return self
-
-    def limit(self, n):
-        self.docs = self.docs[:n]
-        return self
-
-    async def __aiter__(self):
-        for doc in self.docs:
-            yield doc
-
-
-class DummyMongoDB:
-    def __init__(self, docs):
-        self.docs = docs
-        self.tracking = self
-
-    def find(self, match_stage):
-        return DummyCursor(self.docs)
-
-    def aggregate(self, pipeline):
-        grouped = defaultdict(
-            lambda: {"_id": None, "km_total": 0, "time_total": 0, "rounds": 0}
-        )
-        for doc in self.docs:
-            username = doc["username"]
-            if grouped[username]["_id"] is None:
-                grouped[username]["_id"] = username
-            grouped[username]["km_total"] += doc["km"]
-            grouped[username]["time_total"] += doc["time_seconds"]
-            grouped[username]["rounds"] += 1
-        result = list(grouped.values())
-
-        class AsyncIter:
-            def __init__(self, items):
-                self.items = items
-
-            async def __aiter__(self):
-                for item in self.items:
-                    yield item
-
-        return AsyncIter(result)
+from bench_fixtures import DummySession, DummyCursor, DummyMongoDB
 
 
 @pytest.mark.asyncio
@@ -81,7 +23,7 @@ async def test_get_tracking_results_python(group_rounds):
             "tracking_id": 1,
             "start_date_time": now,
             "time": "00:15:00",
-            "km": 5.0,
+            "metres": 5000,
             "event_name": "E1",
             "username": "alice",
         },
@@ -89,7 +31,7 @@ async def test_get_tracking_results_python(group_rounds):
             "tracking_id": 2,
             "start_date_time": now + timedelta(seconds=900),
             "time": "00:15:00",
-            "km": 5.0,
+            "metres": 5000,
             "event_name": "E1",
             "username": "alice",
         },
@@ -97,7 +39,7 @@ async def test_get_tracking_results_python(group_rounds):
             "tracking_id": 3,
             "start_date_time": now + timedelta(hours=1),
             "time": "00:20:00",
-            "km": 10.0,
+            "metres": 10000,
             "event_name": "E2",
             "username": "bob",
         },
@@ -132,7 +74,7 @@ async def test_get_tracking_results_mongodb_python(group_rounds):
             "start_date_time": now,
             "time": "00:15:00",
             "time_seconds": 900,
-            "km": 5.0,
+            "metres": 5000,
             "event_name": "E1",
             "username": "alice",
         },
@@ -141,7 +83,7 @@ async def test_get_tracking_results_mongodb_python(group_rounds):
             "start_date_time": now + timedelta(seconds=900),
             "time": "00:15:00",
             "time_seconds": 900,
-            "km": 5.0,
+            "metres": 5000,
             "event_name": "E1",
             "username": "alice",
         },
@@ -150,7 +92,7 @@ async def test_get_tracking_results_mongodb_python(group_rounds):
             "start_date_time": now + timedelta(hours=1),
             "time": "00:20:00",
             "time_seconds": 1200,
-            "km": 10.0,
+            "metres": 10000,
             "event_name": "E2",
             "username": "bob",
         },
@@ -179,8 +121,8 @@ async def test_get_tracking_results_mongodb_python(group_rounds):
 @pytest.mark.asyncio
 async def test_get_tracking_results_sqlalchemy_all():
     rows = [
-        {"username": "alice", "km_total": 10.0, "time_total": 1800, "rounds": 2},
-        {"username": "bob", "km_total": 10.0, "time_total": 1200, "rounds": 1},
+        {"username": "alice", "metres_total": 10000, "time_total": 1800, "rounds": 2},
+        {"username": "bob", "metres_total": 10000, "time_total": 1200, "rounds": 1},
     ]
     session = DummySession(rows)
     res = await sa_filter.get_tracking_results_sqlalchemy(
@@ -207,7 +149,7 @@ async def test_get_tracking_results_mongodb_all():
             "start_date_time": now,
             "time": "00:15:00",
             "time_seconds": 900,
-            "km": 5.0,
+            "metres": 5000,
             "event_name": "E1",
             "username": "alice",
         },
@@ -216,7 +158,7 @@ async def test_get_tracking_results_mongodb_all():
             "start_date_time": now + timedelta(seconds=1),
             "time": "00:15:00",
             "time_seconds": 900,
-            "km": 5.0,
+            "metres": 5000,
             "event_name": "E1",
             "username": "alice",
         },
@@ -225,7 +167,7 @@ async def test_get_tracking_results_mongodb_all():
             "start_date_time": now + timedelta(hours=1),
             "time": "00:20:00",
             "time_seconds": 1200,
-            "km": 10.0,
+            "metres": 10000,
             "event_name": "E2",
             "username": "bob",
         },
@@ -243,3 +185,1196 @@ async def test_get_tracking_results_mongodb_all():
     assert isinstance(res, list)
     assert any(r["username"] == "alice" and r["km_total"] == 10.0 for r in res)
     assert any(r["username"] == "bob" and r["km_total"] == 10.0 for r in res)
+
+
+def test_validate_measurements_drops_implausible_splits():
+    import split_validation
+
+    start = datetime(2025, 6, 3, 12, 0, 0)
+    points = [
+        {
+            "track_id": "t1",
+            "name": "P1",
+            "min_split_time": "00:01:00",
+            "max_split_time": "00:10:00",
+            "least_time": None,
+        },
+        {
+            "track_id": "t1",
+            "name": "P2",
+            "min_split_time": "00:01:00",
+            "max_split_time": "00:10:00",
+            "least_time": None,
+        },
+    ]
+    measurements = [
+        {"tracking_id": 1, "track_id": "t1", "name": "P1", "timestamp": start},
+        {
+            "tracking_id": 1,
+            "track_id": "t1",
+            "name": "P2",
+            "timestamp": start + timedelta(seconds=5),
+        },
+        {
+            "tracking_id": 1,
+            "track_id": "t1",
+            "name": "P2",
+            "timestamp": start + timedelta(minutes=4),
+        },
+        {"tracking_id": 2, "track_id": "t1", "name": "P1", "timestamp": start},
+        {
+            "tracking_id": 2,
+            "track_id": "t1",
+            "name": "P2",
+            "timestamp": start + timedelta(minutes=30),
+        },
+        {
+            "tracking_id": 2,
+            "track_id": "t1",
+            "name": "XX",
+            "timestamp": start + timedelta(minutes=31),
+        },
+    ]
+    laps = split_validation.validate_measurements(measurements, points)
+    assert [m["timestamp"] for m in laps[1]] == [start, start + timedelta(minutes=4)]
+    assert [m["timestamp"] for m in laps[2]] == [start]
+
+
+def test_validate_measurements_flags_skipped_and_out_of_order_points():
+    import split_validation
+
+    start = datetime(2025, 6, 3, 12, 0, 0)
+    points = [
+        {
+            "track_id": "t1",
+            "name": name,
+            "min_split_time": "00:01:00",
+            "max_split_time": "00:10:00",
+            "least_time": None,
+        }
+        for name in ("P1", "P2", "P3", "P4")
+    ]
+
+    def reads(tracking_id, names):
+        return [
+            {
+                "tracking_id": tracking_id,
+                "track_id": "t1",
+                "name": name,
+                "timestamp": start + timedelta(minutes=3 * i),
+            }
+            for i, name in enumerate(names)
+        ]
+
+    measurements = (
+        reads("complete", ["P1", "P2", "P3", "P4", "P1"])
+        + reads("skipped", ["P1", "P2", "P4", "P1"])
+        + reads("swapped", ["P1", "P3", "P2", "P4"])
+    )
+    laps = split_validation.validate_measurements(measurements, points, drop=False)
+    assert [m["valid"] for m in laps["complete"]] == [True] * 5
+    # P3 fehlt: P4 liegt nicht am erwarteten Punkt, die folgenden Splits sind nicht zuzuordnen
+    assert [m["valid"] for m in laps["skipped"]] == [True, True, False, False]
+    assert [m["valid"] for m in laps["swapped"]] == [True, False, False, False]
+
+
+@pytest.mark.asyncio
+async def test_live_leaderboard_ranks_and_subscription():
+    import asyncio
+    from live_leaderboard import LiveLeaderboard
+
+    board = LiveLeaderboard()
+    board.load(
+        [
+            {"username": "alice", "km_total": 10.0, "time_total": 1800, "rounds": 2},
+            {"username": "bob", "km_total": 5.0, "time_total": 900, "rounds": 1},
+        ]
+    )
+    updates = board.subscribe()
+    # ohne vorherige Iteration: die Änderung muss trotzdem ankommen
+    change = board.add_tracking(
+        {"username": "bob", "metres": 10000, "time": "00:20:00"}
+    )
+    assert change["old_rank"] == 2 and change["new_rank"] == 1
+    assert (await updates.__anext__())["username"] == "bob"
+    assert board.rank("alice") == 2
+    assert [r["username"] for r in board.top(1)] == ["bob"]
+    await updates.aclose()
+    assert not board._subscribers
+    with pytest.raises(StopAsyncIteration):
+        await updates.__anext__()
+
+
+@pytest.mark.asyncio
+async def test_live_leaderboard_publishes_displaced_users_and_filters_event():
+    import asyncio
+    from live_leaderboard import LiveLeaderboard
+
+    board = LiveLeaderboard(event_id="e1")
+    board.load(
+        [
+            {"username": "alice", "km_total": 10.0, "time_total": 1800, "rounds": 2},
+            {"username": "bob", "km_total": 8.0, "time_total": 1500, "rounds": 2},
+            {"username": "carol", "km_total": 5.0, "time_total": 900, "rounds": 1},
+        ]
+    )
+    events = []
+    updates = board.subscribe()
+
+    async def collect():
+        async for change in updates:
+            events.append(change)
+
+    task = asyncio.ensure_future(collect())
+    await asyncio.sleep(0)
+    assert (
+        board.add_tracking(
+            {"username": "carol", "metres": 9000, "time": "00:20:00", "event_id": "e2"}
+        )
+        is None
+    )
+    board.add_tracking(
+        {"username": "carol", "metres": 6000, "time": "00:20:00", "event_id": "e1"}
+    )
+    board.add_tracking(
+        {"username": "dave", "metres": 9000, "time": "00:20:00", "event_id": "e1"}
+    )
+    await asyncio.sleep(0)
+    moves = [(e["username"], e["old_rank"], e["new_rank"]) for e in events]
+    assert moves == [("carol", 3, 1), ("dave", None, 3)]
+    # alice/bob rücken nach carols Sprung um 1 nach hinten, bob nach daves Einstieg erneut
+    assert [e["shifted"] for e in events] == [(2, 3, 1), (4, 4, 1)]
+    assert [r["username"] for r in board.top()] == ["carol", "alice", "dave", "bob"]
+    drop = board.add_tracking(
+        {"username": "bob", "metres": 0, "time": "00:00:00", "event_id": "e1"}
+    )
+    assert drop["shifted"] is None
+    task.cancel()
+    await asyncio.sleep(0)
+    assert not board._subscribers
+
+
+@pytest.mark.asyncio
+async def test_mongodb_rows_tolerate_missing_fields():
+    now = datetime(2025, 6, 3, 12, 0, 0)
+    # Projektion wie TRACKING_PROJECTION, aber ohne event_name
+    docs = [
+        {
+            "tracking_id": 1,
+            "start_date_time": now,
+            "time": 900,
+            "time_seconds": 900,
+            "metres": 5000,
+            "username": "alice",
+        }
+    ]
+    rows = await mongo_filter.fetch_tracking_tuples(
+        DummyMongoDB(docs), None, date(2025, 6, 1), date(2025, 6, 5)
+    )
+    assert rows == [(1, now, 900, 5000, None, "alice")]
+    res = await mongo_filter.get_tracking_results_mongodb(
+        DummyMongoDB(docs), None, date(2025, 6, 1), date(2025, 6, 5)
+    )
+    assert res[0]["event_name"] is None and res[0]["km"] == 5.0
+
+
+@pytest.mark.asyncio
+async def test_build_match_stage_event_participants():
+    class Participants:
+        async def distinct(self, key, query):
+            assert key == "user_id" and query == {"event_id": "e1"}
+            return ["u1", "u2"]
+
+    class Users:
+        async def distinct(self, key, query):
+            assert key == "user_id" and query == {"club_id": "c1"}
+            return ["u2", "u3"]
+
+    db = SimpleNamespace(event_participants=Participants(), users=Users())
+    match_stage = await mongo_filter.build_match_stage(
+        db,
+        "female",
+        date(2025, 6, 1),
+        date(2025, 6, 5),
+        event_id="e1",
+        club_id="c1",
+        participants_only=True,
+    )
+    assert match_stage["event_id"] == "e1"
+    assert "club_id" not in match_stage
+    assert match_stage["user_id"] == {"$in": ["u2"]}
+    club_only = await mongo_filter.build_match_stage(
+        db, None, date(2025, 6, 1), date(2025, 6, 5), club_id="c1"
+    )
+    assert club_only["user_id"] == {"$in": ["u2", "u3"]}
+    with pytest.raises(ValueError):
+        sa_filter.build_params(
+            None, date(2025, 6, 1), date(2025, 6, 5), participants_only=True
+        )
+
+
+@pytest.mark.asyncio
+async def test_mongodb_cursor_pagination():
+    from pagination import next_cursor
+
+    now = datetime(2025, 6, 3, 12, 0, 0)
+    docs = [
+        {
+            "tracking_id": str(i),
+            "start_date_time": now - timedelta(minutes=i),
+            "time": 900,
+            "time_seconds": 900,
+            "metres": 5000,
+            "event_name": "E1",
+            "username": "alice",
+        }
+        for i in range(3)
+    ]
+
+    class CursorDB(DummyMongoDB):
+        def find(self, match_stage, projection=None, **kwargs):
+            self.match_stage = match_stage
+            return DummyCursor(self.docs)
+
+    db = CursorDB(docs)
+    page = await mongo_filter.get_tracking_results_mongodb(
+        db, None, date(2025, 6, 1), date(2025, 6, 5), limit=2
+    )
+    cursor = next_cursor(page, "start", 2)
+    await mongo_filter.get_tracking_results_mongodb(
+        db, None, date(2025, 6, 1), date(2025, 6, 5), limit=2, cursor=cursor
+    )
+    seek = db.match_stage["$and"][1]["$or"]
+    assert seek[0] == {"start_date_time": {"$lt": now - timedelta(minutes=1)}}
+    assert seek[1]["tracking_id"] == {"$lt": "1"}
+    assert next_cursor(page[:1], "start", 2) is None
+
+
+def test_sharded_merge_stitches_behind_chains():
+    import sharded_query
+
+    shards = sharded_query.split_period(date(2025, 6, 1), date(2025, 6, 10), 3)
+    assert shards[0][0] == date(2025, 6, 1) and shards[-1][1] == date(2025, 6, 10)
+    assert sum((e - s).days + 1 for s, e in shards) == 10
+
+    late = datetime(2025, 6, 3, 23, 50, 0)
+    partials = [
+        [{"username": "alice", "start_date_time": late, "time": 600, "rounds": 1}],
+        [
+            {
+                "username": "alice",
+                "start_date_time": late + timedelta(seconds=600),
+                "time": 1200,
+                "rounds": 2,
+            },
+            {
+                "username": "bob",
+                "start_date_time": late + timedelta(hours=1),
+                "time": 900,
+                "rounds": 1,
+            },
+        ],
+    ]
+    res = sharded_query.merge_partials(partials, "behind", "best", 10)
+    assert res[0]["username"] == "alice" and res[0]["rounds"] == 3
+    assert res[0]["time"] == 1800
+    assert len(res) == 2
+
+
+@pytest.mark.parametrize("group_rounds", ["all", "behind"])
+def test_aggregate_parallel_matches_single_core(group_rounds):
+    import asyncio
+    import parallel_aggregation
+
+    now = datetime(2025, 6, 3, 12, 0, 0)
+    rows = [
+        {
+            "tracking_id": i,
+            "start_date_time": now + timedelta(seconds=900 * (i // 2)),
+            "time": "00:15:00",
+            "metres": 5000,
+            "event_name": "E1",
+            "username": f"user_{i % 2}",
+        }
+        for i in range(20)
+    ]
+    expected = asyncio.run(
+        sa_filter.get_tracking_results_python(
+            DummySession(rows),
+            None,
+            date(2025, 6, 1),
+            date(2025, 6, 5),
+            "best",
+            group_rounds,
+            10,
+        )
+    )
+    res = parallel_aggregation.aggregate_parallel(
+        parallel_aggregation.rows_to_columns(rows), group_rounds, "best", 10, workers=2
+    )
+    key = "km_total" if group_rounds == "all" else "rounds"
+    assert [(r["username"], r[key]) for r in res] == [
+        (r["username"], r[key]) for r in expected
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fetch_tracking_columns_decodes_raw_batches():
+    import bson
+
+    now = datetime(2025, 6, 3, 12, 0, 0)
+    docs = [
+        {
+            "tracking_id": "1",
+            "start_date_time": now,
+            "time": 900.0,
+            "metres": 5000,
+            "event_name": "E1",
+            "username": "alice",
+        },
+        {
+            "tracking_id": "2",
+            "start_date_time": now,
+            "time": 1200.0,
+            "metres": 10000,
+            "event_name": None,
+            "username": "bob",
+        },
+    ]
+
+    class RawDB:
+        tracking = None
+
+        def find_raw_batches(self, match_stage, projection, batch_size):
+            assert projection["time"] == "$time_seconds"
+            assert "user_id" not in projection and "gender" not in projection
+            return DummyCursor([b"".join(bson.encode(doc) for doc in docs)])
+
+    db = RawDB()
+    db.tracking = db
+    columns = await mongo_filter.fetch_tracking_columns(
+        db, None, date(2025, 6, 1), date(2025, 6, 5)
+    )
+    assert columns["username"] == ["alice", "bob"]
+    assert columns["time"] == [900.0, 1200.0]
+    assert columns["start_date_time"] == [now, now]
+
+
+class TrackingCopies:
+    """Tracking-Collection mit den Operationen, die DenormalizationSync nutzt."""
+
+    def __init__(self, user_ids, failures=0):
+        self.docs = [
+            {"_id": i, "user_id": user_id, "user_version": 0}
+            for i, user_id in enumerate(user_ids)
+        ]
+        self.failures = failures
+        self.batches = []
+
+    @staticmethod
+    def _stale(doc, query):
+        return doc["user_version"] < query["user_version"]["$not"]["$gte"]
+
+    def find(self, query, projection):
+        assert projection == {"_id": 1}
+        return DummyCursor(
+            [
+                {"_id": doc["_id"]}
+                for doc in self.docs
+                if doc["user_id"] == query["user_id"] and self._stale(doc, query)
+            ]
+        )
+
+    async def bulk_write(self, ops, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("primary stepped down")
+        self.batches.append(ops)
+        for op in ops:
+            ids = set(op._filter["_id"]["$in"])
+            for doc in self.docs:
+                if doc["_id"] in ids and self._stale(doc, op._filter):
+                    doc.update(op._doc["$set"])
+
+
+@pytest.mark.asyncio
+async def test_denormalization_sync_coalesces_user_changes():
+    from mongo_denorm_sync import DenormalizationSync
+
+    class Users:
+        version = 0
+
+        async def find_one_and_update(self, query, update, **kwargs):
+            self.version += 1
+            return {"version": self.version}
+
+    db = SimpleNamespace(users=Users(), tracking=TrackingCopies(["u1"] * 5 + ["u2"]))
+    sync = DenormalizationSync(db, batch_size=2)
+    await sync.update_user("u1", username="neo")
+    version = await sync.update_user("u1", gender="female")
+    await sync.update_user("u2", gender="male")
+    await sync.flush()
+    # Höchstens batch_size Dokumente je bulk_write, auch für die 5 Kopien von u1
+    sizes = [
+        sum(len(op._filter["_id"]["$in"]) for op in ops) for ops in db.tracking.batches
+    ]
+    assert sizes == [2, 2, 2]
+    update = db.tracking.batches[0][0]._doc["$set"]
+    assert update == {"username": "neo", "gender": "female", "user_version": 2}
+    assert all(d["user_version"] == 2 for d in db.tracking.docs if d["user_id"] == "u1")
+    assert db.tracking.docs[-1] == {
+        "_id": 5,
+        "user_id": "u2",
+        "user_version": 3,
+        "gender": "male",
+    }
+    assert await sync.wait_synced("u1", version) >= 0
+
+
+@pytest.mark.asyncio
+async def test_denormalization_sync_keeps_changes_on_failed_write():
+    import asyncio
+    from mongo_denorm_sync import DenormalizationSync
+
+    class Users:
+        version = 0
+
+        async def find_one_and_update(self, query, update, **kwargs):
+            if query["user_id"] == "ghost":
+                return None
+            self.version += 1
+            return {"version": self.version}
+
+    db = SimpleNamespace(users=Users(), tracking=TrackingCopies(["u1"], failures=1))
+    sync = DenormalizationSync(db, flush_interval=0)
+    with pytest.raises(ValueError):
+        await sync.update_user("ghost", username="x")
+
+    sync.start()
+    version = await sync.update_user("u1", username="neo")
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(sync.wait_synced("u1", version), timeout=1)
+    with pytest.raises(RuntimeError):
+        await sync.stop()
+
+    # Der fehlgeschlagene Batch ist noch eingestellt und wird mit neueren Änderungen zusammengeführt
+    version = await sync.update_user("u1", gender="female")
+    await sync.flush()
+    update = db.tracking.batches[0][0]._doc["$set"]
+    assert update == {"username": "neo", "gender": "female", "user_version": version}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("group_rounds", ["all", "behind", "none"])
+@pytest.mark.parametrize("order_by", ["start", "best"])
+async def test_duckdb_matches_mongodb_python(tmp_path, group_rounds, order_by):
+    pytest.importorskip("duckdb")
+    import duckdb_filter
+    from mongo_benchmark import results_almost_equal
+
+    now = datetime(2025, 6, 3, 12, 0, 0)
+    trackings = [
+        {
+            "tracking_id": str(i),
+            "user_id": f"u{i % 3}",
+            "event_id": "e1",
+            "start_date_time": now + timedelta(seconds=900 * (i // 3)),
+            "time_seconds": 900.0,
+            "metres": 5000 + 1000 * (i % 3),
+            "event_name": "E1",
+            "username": f"user_{i % 3}",
+            "gender": "male",
+        }
+        for i in range(12)
+    ]
+    # 1 s Versatz je Runde: 0/101 s bilden eine Kette, 202 s liegt 2 s hinter deren Ende
+    trackings += [
+        {
+            "tracking_id": f"j{i}",
+            "user_id": "uj",
+            "event_id": "e1",
+            "start_date_time": now + timedelta(hours=5, seconds=101 * i),
+            "time_seconds": 100.0,
+            "metres": 1000,
+            "event_name": "E1",
+            "username": "jitter",
+            "gender": "male",
+        }
+        for i in range(3)
+    ]
+    path = str(tmp_path / "tracking.parquet")
+    duckdb_filter.export_snapshot(trackings, path)
+    con = duckdb_filter.connect(path)
+    args = (None, date(2025, 6, 1), date(2025, 6, 5), order_by, group_rounds, 100)
+    res = await duckdb_filter.get_tracking_results_duckdb(con, *args)
+    docs = [dict(tr, time=tr["time_seconds"]) for tr in trackings]
+    expected = await mongo_filter.get_tracking_results_mongodb_python(
+        DummyMongoDB(docs), *args
+    )
+    if group_rounds == "none":
+        key = "start_date_time" if order_by == "start" else "time"
+        assert [r[key] for r in res] == [r[key] for r in expected]
+    else:
+        assert results_almost_equal(res, expected)
+    if group_rounds == "behind":
+        jitter = sorted(r["rounds"] for r in res if r["username"] == "jitter")
+        assert jitter == [1, 2]
+
+
+def test_backend_start_does_not_load_output_libraries():
+    import subprocess
+
+    code = (
+        "import sys, main, mongo_filter, sqlalchemy_filter\n"
+        "print(sorted(m for m in ('pyarrow', 'orjson') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert out.strip() == "[]"
+
+
+def test_result_store_report_flags_regression(tmp_path):
+    pytest.importorskip("pyarrow")
+    from result_store import ResultStore, list_runs, load_results
+    from benchmark_report import CELL_KEYS, compare_runs
+
+    header = ["db_system", "variant", "n_users", "n_trackings", "group_rounds"]
+    header += ["order_by", "duration", "equal"]
+    for run_id, base, equal in (("a", 0.1, None), ("b", 0.2, True)):
+        with ResultStore(
+            "read",
+            header,
+            root=str(tmp_path),
+            run_id=run_id,
+            git_commit="abc",
+            batch_size=4,
+        ) as store:
+            for i in range(10):
+                store.append(
+                    ["sql", "sql", 10, 100, "all", "start", base + i / 1e3, equal]
+                )
+    assert list_runs("read", str(tmp_path)) == ["a", "b"]
+    baseline = load_results("read", str(tmp_path), ["a"])
+    assert len(baseline) == 10
+    report = compare_runs(
+        load_results("read", str(tmp_path), ["b"]), baseline, CELL_KEYS["read"]
+    )
+    assert report[0]["regression"]
+    assert not compare_runs(baseline, baseline, CELL_KEYS["read"])[0]["regression"]
+
+
+@pytest.mark.asyncio
+async def test_kernel_benchmark_pins_implementations_to_reference():
+    import kernel_benchmark
+
+    implementations = [
+        impl
+        for impl in kernel_benchmark.IMPLEMENTATIONS
+        if impl[0] != "python_parallel"
+    ]
+    measurements = await kernel_benchmark.run_kernels(
+        [500], implementations=implementations, n_runs=1
+    )
+    assert len(measurements) == len(implementations) * len(kernel_benchmark.KERNELS)
+    assert all(m[-1] for m in measurements)
+
+    rows = kernel_benchmark.generate_rows(3)
+    docs = kernel_benchmark.to_mongo_docs(rows)
+    assert [doc["time"] for doc in docs] == [
+        sa_filter.time_to_seconds(row["time"]) for row in rows
+    ]
+    assert docs[0] is not rows[0] and not isinstance(rows[0]["time"], (int, float))
+
+
+def test_scaling_fit_finds_model_crossover_and_slo():
+    from scaling_sweep import analyze
+    from sweep_config import geometric_range
+
+    sizes = geometric_range(1000, 100000, 10**0.5)
+    assert sizes[0] == 1000 and sizes[-1] == 100000 and len(sizes) == 5
+    rows = [
+        {
+            "implementation": impl,
+            "group_rounds": "all",
+            "order_by": "best",
+            "n_rows": n,
+            "duration": t(n),
+        }
+        for n in sizes
+        for impl, t in (
+            ("linear", lambda n: 1e-3 * n),
+            ("quadratic", lambda n: 1e-7 * n**2),
+        )
+    ]
+    report = analyze(rows, "kernel", slo_seconds=50)
+    curves = {c["variant"][0]: c for c in report["curves"]}
+    assert curves["linear"]["model"] == "linear"
+    assert curves["quadratic"]["model"] == "quadratic"
+    assert abs(curves["quadratic"]["exponent"] - 2) < 1e-6
+    assert abs(curves["linear"]["slo_n"] - 50000) / 50000 < 0.05
+    (crossing,) = report["crossovers"]
+    assert abs(crossing["n"] - 10000) / 10000 < 0.05
+
+
+@pytest.mark.asyncio
+async def test_benchmark_mongo_memory_mode_reports_columns():
+    from mongo_benchmark import benchmark_mongo
+    from memory_profile import memory_columns
+
+    now = datetime(2025, 6, 3, 12, 0, 0)
+    docs = [
+        {
+            "tracking_id": str(i),
+            "start_date_time": now + timedelta(minutes=i),
+            "time": 60.0,
+            "metres": 1000,
+            "event_name": "E1",
+            "username": f"user_{i % 5}",
+        }
+        for i in range(200)
+    ]
+    res = await benchmark_mongo(
+        DummyMongoDB(docs),
+        None,
+        "behind",
+        "start",
+        100,
+        "mongo_python",
+        memory=True,
+        top_allocations=3,
+    )
+    peak, blocks_per_row, rss_delta = memory_columns(res)
+    assert peak > 0 and blocks_per_row > 0
+    assert rss_delta is None or isinstance(rss_delta, int)
+    assert len(res["top_allocations"]) <= 3
+    plain = await benchmark_mongo(
+        DummyMongoDB(docs), None, "behind", "start", 100, "mongo_python", memory=False
+    )
+    assert memory_columns(plain) == [None, None, None]
+
+
+SHAPES = [
+    ("all", "start"),
+    ("behind", "start"),
+    ("none", "start"),
+    ("all", "best"),
+    ("behind", "best"),
+    ("none", "best"),
+]
+
+
+@pytest.mark.asyncio
+async def test_python_batch_matches_single_shapes():
+    from parallel_benchmark import generate_rows
+
+    session = DummySession(generate_rows(2000, n_users=20))
+    args = (None, date(2010, 1, 1), date(2025, 12, 31))
+    batch = await sa_filter.get_tracking_results_python_batch(
+        session, *args, SHAPES, 50
+    )
+    for group_rounds, order_by in SHAPES:
+        assert batch[
+            (group_rounds, order_by)
+        ] == await sa_filter.get_tracking_results_python(
+            session, *args, order_by, group_rounds, 50
+        )
+
+
+@pytest.mark.asyncio
+async def test_mongodb_batch_issues_single_facet_pipeline():
+    pipelines = []
+    rows = {
+        i: {
+            "tracking_id": i,
+            "start_date_time": datetime(2025, 6, 3, 12, i),
+            "time": 900.0,
+            "metres": 5000,
+            "event_name": "E1",
+            "username": "alice",
+        }
+        for i in (1, 2)
+    }
+
+    class Tracking:
+        def aggregate(self, pipeline):
+            pipelines.append(pipeline)
+
+            async def facet():
+                yield {
+                    "all": [
+                        {
+                            "_id": "alice",
+                            "metres_total": 10000,
+                            "time_total": 1800.0,
+                            "rounds": 2,
+                        }
+                    ],
+                    "rows_start": [rows[2], rows[1]],
+                    "rows_best": [rows[1], rows[2]],
+                }
+
+            return facet()
+
+    db = SimpleNamespace(tracking=Tracking())
+    res = await mongo_filter.get_tracking_results_mongodb_batch(
+        db, None, date(2025, 6, 1), date(2025, 6, 5), SHAPES, 10
+    )
+    assert len(pipelines) == 1
+    assert sorted(pipelines[0][1]["$facet"]) == ["all", "rows_best", "rows_start"]
+    assert (
+        res[("all", "best")]
+        == res[("all", "start")]
+        == [{"username": "alice", "km_total": 10.0, "time_total": 1800.0, "rounds": 2}]
+    )
+    assert [r["tracking_id"] for r in res[("none", "start")]] == [2, 1]
+    assert res[("behind", "start")] == res[("none", "start")]
+    assert res[("none", "best")][0]["km"] == 5.0
+
+
+@pytest.mark.asyncio
+async def test_mongo_index_spec_and_covered_plan_detection():
+    from mongo_indexes import INDEX_SPEC, create_indexes, explain_query
+
+    created = defaultdict(list)
+
+    class Collection:
+        def __init__(self, name):
+            self.name = name
+
+        async def create_indexes(self, models):
+            created[self.name].extend(m.document["name"] for m in models)
+
+    class DB(dict):
+        def __missing__(self, name):
+            return Collection(name)
+
+        async def command(self, name, command, verbosity):
+            assert name == "explain" and "aggregate" in command
+            return {
+                "stages": [
+                    {
+                        "$cursor": {
+                            "queryPlanner": {
+                                "winningPlan": {
+                                    "stage": "PROJECTION_COVERED",
+                                    "inputStage": {
+                                        "stage": "IXSCAN",
+                                        "indexName": "gender_start_totals_covered",
+                                    },
+                                },
+                                "rejectedPlans": [{"stage": "FETCH"}],
+                            }
+                        }
+                    },
+                    {"$group": {}},
+                ]
+            }
+
+    db = DB()
+    build_times = await create_indexes(db)
+    assert set(created) == set(INDEX_SPEC)
+    assert len(build_times) == sum(len(indexes) for indexes in INDEX_SPEC.values())
+    plan = await explain_query(db, "male", "all", "start", 100)
+    assert plan["stages"] == ["PROJECTION_COVERED", "IXSCAN"]
+    assert plan["indexes"] == ["gender_start_totals_covered"]
+    assert plan["covered"]
+
+
+@pytest.mark.asyncio
+async def test_mongo_clear_drops_collections_with_indexes():
+    import mongo_benchmark
+
+    dropped = []
+
+    class Collection:
+        def __init__(self, name):
+            self.name = name
+
+        async def drop(self):
+            dropped.append(self.name)
+
+    db = SimpleNamespace(
+        **{name: Collection(name) for name in ("users", "tracks", "events", "tracking")}
+    )
+    await mongo_benchmark.clear({"db": db})
+    assert sorted(dropped) == ["events", "tracking", "tracks", "users"]
+
+
+@pytest.mark.asyncio
+async def test_prewarm_statements_hits_cache_for_real_calls():
+    sa_filter.build_statement.cache_clear()
+    await sa_filter.prewarm_statements(DummySession([]))
+    warmed = sa_filter.build_statement.cache_info()
+    assert warmed.hits == 0 and warmed.misses == warmed.currsize
+    args = (DummySession([]), "male", date(2025, 6, 1), date(2025, 6, 5))
+    await sa_filter.get_tracking_results_sqlalchemy(*args, "start", "all")
+    await sa_filter.get_tracking_results_sqlalchemy(*args, "best", "none")
+    await sa_filter.get_tracking_results_python(*args, "start", "behind")
+    info = sa_filter.build_statement.cache_info()
+    assert (info.hits, info.misses) == (3, warmed.misses)
+
+
+def test_sargable_period_predicates_and_plan_summary():
+    from sqlalchemy.dialects import mysql
+    from sqlalchemy_benchmark import summarize_plan
+
+    params = sa_filter.build_params("male", date(2020, 1, 1), date(2020, 1, 31))
+    assert params["start_at"] == datetime(2020, 1, 1)
+    assert params["end_before"] == datetime(2020, 2, 1)
+    sql = str(
+        sa_filter.build_statement("rows", "start", frozenset(params)).compile(
+            dialect=mysql.dialect()
+        )
+    )
+    assert "date(" not in sql.lower()
+    assert "tracking.start_date_time >= " in sql
+    assert "tracking.start_date_time < " in sql
+    legacy = str(
+        sa_filter.build_statement(
+            "rows", "start", frozenset(["start_period", "end_period"]), sargable=False
+        ).compile(dialect=mysql.dialect())
+    )
+    assert "date(tracking.start_date_time)" in legacy.lower()
+
+    plan = {
+        "query_block": {
+            "nested_loop": [
+                {
+                    "table": {
+                        "table_name": "tracking",
+                        "access_type": "range",
+                        "key": "ix_tracking_start_cover",
+                        "rows_examined_per_scan": 42,
+                        "using_index": True,
+                    }
+                },
+                {"table": {"table_name": "users", "access_type": "eq_ref"}},
+            ]
+        }
+    }
+    assert summarize_plan(plan) == [
+        {
+            "table": "tracking",
+            "access_type": "range",
+            "key": "ix_tracking_start_cover",
+            "rows_examined": 42,
+            "covering": True,
+            "filesort": False,
+        },
+        {
+            "table": "users",
+            "access_type": "eq_ref",
+            "key": None,
+            "rows_examined": None,
+            "covering": False,
+            "filesort": False,
+        },
+    ]
+
+
+@pytest.mark.asyncio
+async def test_integer_metre_totals_match_decimal_sums():
+    from decimal import Decimal
+    from row_kernels import km_to_metres, metres_to_km
+
+    distances = [Decimal("0.57"), Decimal("0.10"), Decimal("0.20"), Decimal("9.99")]
+    assert [km_to_metres(float(d)) for d in distances] == [570, 100, 200, 9990]
+    assert km_to_metres(Decimal("0.57")) == km_to_metres("0.57") == 570
+    now = datetime(2025, 6, 3, 12, 0, 0)
+    rows = [
+        {
+            "tracking_id": i,
+            "start_date_time": now + timedelta(hours=i),
+            "time": "00:15:00",
+            "metres": km_to_metres(distances[i % 4]),
+            "event_name": "E1",
+            "username": "alice",
+        }
+        for i in range(40)
+    ]
+    res = await sa_filter.get_tracking_results_python(
+        DummySession(rows), None, date(2025, 6, 1), date(2025, 6, 5), "start", "all"
+    )
+    expected = sum(distances[i % 4] for i in range(40))
+    assert res[0]["km_total"] == float(expected)
+    assert sum(float(distances[i % 4]) for i in range(40)) != float(expected)
+    none = await sa_filter.get_tracking_results_python(
+        DummySession(rows), None, date(2025, 6, 1), date(2025, 6, 5), "start", "none"
+    )
+    assert {r["km"] for r in none} == {float(d) for d in distances}
+    assert metres_to_km(570) == 0.57
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("group_rounds", ["all", "behind", "none"])
+async def test_columnar_outputs_match_dict_results(group_rounds):
+    import orjson
+    from parallel_benchmark import generate_rows
+    from result_output import to_ipc_bytes
+    import pyarrow as pa
+
+    session = DummySession(generate_rows(500, n_users=10))
+    args = (None, date(2010, 1, 1), date(2025, 12, 31), "best", group_rounds, 20)
+    expected = await sa_filter.get_tracking_results_python(session, *args)
+    for row in expected:
+        if group_rounds == "none":
+            row["time"] = sa_filter.time_to_seconds(row["time"])
+    batch = await sa_filter.get_tracking_results_python(session, *args, output="arrow")
+    assert batch.to_pylist() == expected
+    stream = pa.ipc.open_stream(to_ipc_bytes(batch))
+    assert stream.read_next_batch().equals(batch)
+    columns = orjson.loads(
+        await sa_filter.get_tracking_results_python(session, *args, output="json")
+    )
+    assert columns["username"] == [r["username"] for r in expected]
+    with pytest.raises(ValueError):
+        await sa_filter.get_tracking_results_python(session, *args, output="xml")
+
+
+@pytest.mark.asyncio
+async def test_cell_loads_backends_concurrently_in_fk_order(monkeypatch):
+    import asyncio
+    import backends
+    import dual_loader
+    import main
+
+    executed = []
+    events = []
+
+    class Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, stmt, params):
+            await asyncio.sleep(0)
+            executed.append((stmt.table.name, len(params)))
+
+        async def commit(self):
+            pass
+
+    class Collection:
+        def __init__(self, name):
+            self.name = name
+            self.docs = []
+
+        async def insert_many(self, docs, ordered=True):
+            assert ordered is False
+            await asyncio.sleep(0)
+            for doc in docs:
+                doc["_id"] = len(self.docs)
+                self.docs.append(doc)
+
+    db = SimpleNamespace(
+        **{name: Collection(name) for name in ("users", "tracks", "events", "tracking")}
+    )
+    loaded = {}
+
+    def fake_backend(name, load):
+        async def timed_load(resources, data):
+            events.append(("start", name))
+            seconds = await load(resources, *data)
+            events.append(("end", name))
+            loaded[name] = data
+            return seconds
+
+        async def read_benchmarks(resources, cell, data):
+            return []
+
+        return SimpleNamespace(
+            DB_SYSTEM=name, load=timed_load, read_benchmarks=read_benchmarks
+        )
+
+    sql = fake_backend(
+        "SQLAlchemy",
+        lambda resources, *data: dual_loader.load_sql(
+            resources["session_factory"], *data
+        ),
+    )
+    mongo = fake_backend(
+        "MongoDB",
+        lambda resources, *data: dual_loader.load_mongo(resources["db"], *data),
+    )
+    monkeypatch.setitem(sys.modules, "fake_sql", sql)
+    monkeypatch.setitem(sys.modules, "fake_mongo", mongo)
+    monkeypatch.setitem(backends.BACKENDS, "fake_sql", "fake_sql")
+    monkeypatch.setitem(backends.BACKENDS, "fake_mongo", "fake_mongo")
+    monkeypatch.setattr(backends, "_loaded", {})
+
+    cell = await main.run_benchmark_cell(
+        5,
+        50,
+        "all",
+        "start",
+        2,
+        session_factory=Session,
+        db=db,
+        n_tracks=2,
+        n_events=1,
+        backends=["fake_sql", "fake_mongo"],
+    )
+    # Beide Ladevorgänge starten, bevor einer fertig ist
+    assert [kind for kind, _ in events[:2]] == ["start", "start"]
+    assert [row[1] for row in cell[main.RESULT_TABLE_SETUP]] == [
+        "SQLAlchemy",
+        "MongoDB",
+    ]
+    tables = [table for table, _ in executed]
+    assert set(tables[:3]) == {"users", "track", "event"}
+    assert tables[3:] == ["tracking"] * dual_loader.TRACKING_PARTITIONS
+    assert sum(n for table, n in executed if table == "tracking") == 50
+    trackings = loaded["MongoDB"][3]
+    assert loaded["SQLAlchemy"] is loaded["MongoDB"]
+    assert len(db.tracking.docs) == 50 and "_id" not in trackings[0]
+
+
+@pytest.mark.asyncio
+async def test_production_profile_forms_behind_chains_and_skew():
+    from collections import Counter
+    from create_random_data import generate_synchronized_testdata, resolve_profile
+
+    users, _, _, trackings = generate_synchronized_testdata(
+        50, 3, 2, 2000, profile={"name": "production", "gender_weights": [1, 0, 0, 0]}
+    )
+    assert len(trackings) == 2000
+    assert {u["gender"] for u in users} == {"male"}
+    per_user = Counter(t["username"] for t in trackings).most_common()
+    assert per_user[0][1] > 5 * per_user[-1][1]
+
+    chains = await mongo_filter.get_tracking_results_mongodb_python(
+        DummyMongoDB(trackings),
+        "male",
+        date(2000, 1, 1),
+        date(2100, 1, 1),
+        group_rounds="behind",
+        limit=None,
+    )
+    assert sum(c["rounds"] for c in chains) == 2000
+    assert len(chains) < 2000 / 3
+
+    _, _, _, uniform = generate_synchronized_testdata(50, 3, 2, 2000, "uniform")
+    assert len({t["start_date_time"] for t in uniform}) == 2000
+    with pytest.raises(ValueError):
+        resolve_profile({"name": "production", "laps": 3})
+
+
+@pytest.mark.asyncio
+async def test_backend_registry_imports_lazily_and_drives_cell(monkeypatch):
+    import backends
+    import main
+
+    calls = []
+    fake = SimpleNamespace(
+        DB_SYSTEM="Fake",
+        clear=lambda resources: _record(calls, "clear"),
+        load=lambda resources, data: _record(calls, "load", 0.5),
+        read_benchmarks=lambda resources, cell, data: _record(
+            calls, "read", [{"variant": "fake", "duration": 0.1, "result_count": 3}]
+        ),
+        update_benchmarks=lambda resources, user_id, changes: _record(
+            calls,
+            "update",
+            [(run, "update_username", 0.2, None) for run, _, _ in changes],
+        ),
+    )
+    monkeypatch.setitem(sys.modules, "fake_backend", fake)
+    monkeypatch.setitem(backends.BACKENDS, "fake", "fake_backend")
+    monkeypatch.setattr(backends, "_loaded", {})
+    assert backends.selected_backends("fake") == ["fake"]
+    assert "fake" not in backends._loaded
+    with pytest.raises(ValueError):
+        backends.selected_backends("fake,oracle")
+
+    cell = await main.run_benchmark_cell(5, 20, "all", "start", 2, backends=["fake"])
+    assert calls == ["clear", "load", "read", "update"]
+    assert backends._loaded["fake"] is fake
+    assert cell[main.RESULT_TABLE_SETUP][0][1] == "Fake"
+    assert [row[2] for row in cell[main.RESULT_TABLE_READ]] == ["fake"]
+    assert len(cell[main.RESULT_TABLE_UPDATE]) == main.N_UPDATE_RUNS
+    assert cell[main.RESULT_TABLE_PLANS] == []
+
+
+async def _record(calls, name, result=None):
+    calls.append(name)
+    return result
+
+
+@pytest.mark.asyncio
+async def test_cursor_page_plan_reads_in_index_order():
+    from sqlalchemy.dialects import mysql
+    from models import Tracking
+    from sqlalchemy_benchmark import compare_index_plans
+
+    index = next(i for i in Tracking.__table__.indexes if i.name == "ix_tracking_start")
+    assert [c.name for c in index.columns] == ["start_date_time", "tracking_id"]
+
+    def plan(key, filesort):
+        table = {"table_name": "tracking", "access_type": "range", "key": key}
+        return {
+            "query_block": {
+                "ordering_operation": {"using_filesort": filesort, "table": table}
+            }
+        }
+
+    executed = []
+
+    class Connection:
+        dialect = mysql.dialect()
+
+        async def exec_driver_sql(self, sql):
+            executed.append(sql)
+            cursor_page = "(tracking.start_date_time, tracking.tracking_id) <" in sql
+            sargable = "date(" not in sql.lower()
+            body = plan(
+                "ix_tracking_start" if sargable else None,
+                filesort=not sargable and not cursor_page,
+            )
+            return SimpleNamespace(scalar=lambda: json.dumps(body))
+
+    class Session:
+        async def connection(self):
+            return Connection()
+
+    plans = await compare_index_plans(Session(), "male", "none", "start", 100)
+    assert set(plans) == {"before", "after", "cursor"}
+    assert "(tracking.start_date_time, tracking.tracking_id) <" in executed[-1]
+    assert plans["cursor"][0]["key"] == "ix_tracking_start"
+    assert not plans["cursor"][0]["filesort"]
+    assert plans["before"][0]["filesort"]
+    assert set(await compare_index_plans(Session(), "male", "all", "start", 100)) == {
+        "before",
+        "after",
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("group_rounds", ["all", "behind", "none"])
+@pytest.mark.parametrize("order_by", ["start", "best"])
+async def test_duckdb_benchmark_checks_results_against_python(
+    tmp_path, group_rounds, order_by
+):
+    pytest.importorskip("duckdb")
+    import duckdb_filter
+    from create_random_data import generate_synchronized_testdata
+    from duckdb_benchmark import benchmark_duckdb
+
+    _, _, _, trackings = generate_synchronized_testdata(20, 3, 2, 400, "production")
+    path = str(tmp_path / "tracking.parquet")
+    duckdb_filter.export_snapshot(trackings, path)
+    con = duckdb_filter.connect(path)
+    res = await benchmark_duckdb(
+        con, "male", group_rounds, order_by, 100000, memory=False, trackings=trackings
+    )
+    assert res["equal"] is True
+    tampered = [dict(tr, metres=tr["metres"] + 1) for tr in trackings]
+    res = await benchmark_duckdb(
+        con, "male", group_rounds, order_by, 100000, memory=False, trackings=tampered
+    )
+    assert res["equal"] is False